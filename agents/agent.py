@@ -1,10 +1,7 @@
 from google.adk.agents import Agent
 from datetime import datetime
 
-from .sub_agents import (
-    business_metrics_agent,
-    volume_forecasts_agent
-)
+from .sub_agents import all_datasets_agent, dataset_agents
 
 root_agent = Agent(
     name = 'ai_analyst',
@@ -19,12 +16,10 @@ root_agent = Agent(
     instruction = """
     <persona>You are a helpful ai analyst assistant</persona>
     <task>Use the sub agents to get volume forecasts data and business metrics data</task>
+    <task>When a question needs more than one dataset, transfer to all_datasets_agent, which queries them all at once, instead of asking the dataset agents one after another</task>
     <context>When the user asks 'you' to do something, they are refering to you and all sub agents</context>
     """,
-    sub_agents=[
-        volume_forecasts_agent,
-        business_metrics_agent
-    ]
+    sub_agents=list(dataset_agents.values()) + [all_datasets_agent]
 )
 
 
@@ -0,0 +1,93 @@
+"""
+Measure how long a fresh interpreter takes to import the agents, and check it
+against a budget. Heavy libraries must not be loaded until a tool needs them.
+
+    python -m agents.coldstart --budget 2.5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+# Libraries that are only meant to be imported on first use of a tool.
+HEAVY_MODULES = ('duckdb', 'pyarrow', 'pandas', 'matplotlib', 'seaborn', 'prophet', 'cmdstanpy')
+
+DEFAULT_BUDGET = float(os.environ.get('AI_ANALYST_IMPORT_BUDGET', 1.5))
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str = 'agents.agent', repeat: int = 3) -> dict:
+    """
+    Import `module` in `repeat` fresh interpreters.
+
+    Returns
+    -------
+    dict
+        The best and worst wall-clock import time in seconds, the heavy modules
+        that ended up loaded, and the slowest imports by cumulative time as
+        reported by `-X importtime`.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    probe = _PROBE.format(module=module, heavy=HEAVY_MODULES)
+
+    runs, slowest = [], []
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', probe],
+            cwd=root, capture_output=True, text=True, check=True
+        )
+        runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+        # Lines look like "import time:   self [us] | cumulative | name".
+        timings = []
+        for line in proc.stderr.splitlines():
+            if line.startswith('import time:') and '|' in line:
+                _, cumulative, name = line[len('import time:'):].split('|')
+                if cumulative.strip().isdigit():
+                    timings.append((int(cumulative) / 1e6, name.strip()))
+        slowest = sorted(timings, reverse=True)[:15]
+
+    return {
+        'module': module,
+        'best_seconds': min(r['seconds'] for r in runs),
+        'worst_seconds': max(r['seconds'] for r in runs),
+        'heavy_modules_loaded': sorted(set().union(*(r['loaded'] for r in runs))),
+        'slowest_imports': [{'module': name, 'seconds': seconds} for seconds, name in slowest],
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--module', default='agents.agent')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET, help='maximum import time in seconds')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', action='store_true', help='print the full report as JSON')
+    args = parser.parse_args(argv)
+
+    report = measure(args.module, args.repeat)
+    report['budget_seconds'] = args.budget
+    report['ok'] = report['best_seconds'] <= args.budget and not report['heavy_modules_loaded']
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"import {report['module']}: {report['best_seconds']:.3f}s (budget {args.budget:.3f}s)")
+        if report['heavy_modules_loaded']:
+            print(f"heavy modules loaded at import: {', '.join(report['heavy_modules_loaded'])}")
+        for entry in report['slowest_imports'][:10]:
+            print(f"  {entry['seconds']:.3f}s  {entry['module']}")
+
+    return 0 if report['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,459 @@
+"""
+Generate synthetic datasets shaped like the shipped ones, at any scale.
+
+Rows are generated one batch of whole series at a time and written straight to
+CSV or Parquet, so memory stays bounded however many rows are asked for. Every
+series draws from its own random stream, keyed by the seed and the series'
+position (business unit, service line or metric), so a series comes out the
+same whatever the chunk size or the number of other series.
+
+    python -m agents.database.synthetic volume_forecasts /tmp/vf --business-units 50 --service-lines 64 --freq daily --years 10
+    python -m agents.database.synthetic business_metrics /tmp/bm.parquet --metrics 200 --years 20
+
+An output path ending in `.csv` or `.parquet` gets just the data; any other path
+becomes a dataset folder (data.csv, description.md and the YAML configuration)
+that the catalog can load.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import string
+import sys
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+
+FREQUENCIES = {'daily': 'D', 'monthly': 'MS'}
+
+# Rows generated and written at a time.
+CHUNK_ROWS = int(os.environ.get('AI_ANALYST_SYNTHETIC_CHUNK_ROWS', 1_000_000))
+
+BUSINESS_UNITS = ['Commercial', 'Retail']
+
+# Shapes of the shipped business metrics, in the order of `metrics.yaml`:
+# uniform noise, uniform noise smoothed over 3 periods, or whole numbers, all
+# between `low` and `high`. Metrics beyond these cycle through them again.
+METRICS = [
+    ('Home Loan Growth Rate (%)', 'smoothed', 0.04, 0.07),
+    ('ANZ Best Home Loan Rate (<80% LVR)', 'smoothed', 0.035, 0.065),
+    ('Competitor Best Home Loan Rate (<80% LVR)', 'uniform', 0.04, 0.07),
+    ('Home Loan 3-Monthly Attrition Rate (%)', 'uniform', 0.01, 0.03),
+    ('Home Loan Application Volume', 'integer', 1000, 5000),
+    ('BTL Home Loan Campaign Volume', 'integer', 100, 2000),
+    ('ATL Marketing Spend ($)', 'integer', 10000, 250000),
+    ('Overall Complaints Volume', 'integer', 100, 500),
+    ('Home Loan Complaints Volume', 'integer', 20, 250),
+    ('BTL Campaign Conversion Rate', 'uniform', 0.02, 0.08),
+    ('System Growth Rate', 'uniform', 0.0001, 0.0075),
+]
+
+MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+               'August', 'September', 'October', 'November', 'December']
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _rng(seed: int, *key: int) -> np.random.Generator:
+    """
+    The random stream of one series, independent of every other key's.
+    """
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=key))
+
+
+def _dates(start: str, years: float, freq: str) -> pd.DatetimeIndex:
+    import pandas as pd
+
+    start = pd.Timestamp(start)
+    end = start + pd.DateOffset(months=round(years * 12))
+    return pd.date_range(start, end, freq=FREQUENCIES.get(freq, freq), inclusive='left')
+
+
+def _letters(i: int) -> str:
+    """
+    Spreadsheet-style column name of a 0-based index: A, ..., Z, AA, AB, ...
+    """
+    name = ''
+    i += 1
+    while i:
+        i, r = divmod(i - 1, 26)
+        name = string.ascii_uppercase[r] + name
+    return name
+
+
+def _business_unit(i: int) -> str:
+    return BUSINESS_UNITS[i] if i < len(BUSINESS_UNITS) else f"business_unit_{i + 1}"
+
+
+def structure(service_lines: int) -> dict:
+    """
+    The hierarchy of `volume_forecasts` for a number of service lines: two
+    service lines per sub stream and two sub streams per stream, as in the
+    shipped `structure.yaml`.
+    """
+    n_sub_streams = (service_lines + 1) // 2
+    return {
+        'sub_stream': {
+            f"sub_stream_{k + 1}": [f"service_line_{i + 1}" for i in range(2 * k, min(2 * k + 2, service_lines))]
+            for k in range(n_sub_streams)
+        },
+        'stream': {
+            f"stream_{_letters(j)}": [f"sub_stream_{k + 1}" for k in range(2 * j, min(2 * j + 2, n_sub_streams))]
+            for j in range((n_sub_streams + 1) // 2)
+        },
+    }
+
+
+@contextmanager
+def _writer(path: str, schema: pa.Schema, format: str | None = None):
+    """
+    Yield a function writing Arrow tables to one CSV or Parquet file, chosen
+    by `format` or else the extension of `path`.
+    """
+    format = format or ('parquet' if path.endswith('.parquet') else 'csv')
+    if format == 'parquet':
+        import pyarrow.parquet as pq
+
+        writer = pq.ParquetWriter(path, schema, compression='zstd')
+    elif format == 'csv':
+        import pyarrow.csv as pcsv
+
+        writer = pcsv.CSVWriter(path, schema, write_options=pcsv.WriteOptions(quoting_style='needed'))
+    else:
+        raise ValueError(f"Unknown output format '{format}', expected 'csv' or 'parquet'.")
+    try:
+        yield writer.write_table
+    finally:
+        writer.close()
+
+
+def _strings(values: list[str], indices: np.ndarray) -> pa.Array:
+    """
+    A string column holding `values[i]` for every i in `indices`.
+    """
+    import pyarrow as pa
+
+    return pa.array(values, pa.string()).take(pa.array(indices, pa.int32()))
+
+
+def _sub_stream_series(seed: int, b: int, k: int, lines: list[int], n: int) -> np.ndarray:
+    """
+    The log volumes of the service lines of one sub stream. Like the shipped
+    data, sub streams take turns at pairing correlated, lead and lag,
+    negatively lagged and independent series. The walk a pair shares has its
+    own random stream, and so does every service line.
+    """
+    shared = _rng(seed, 0, b, k)
+    own = [_rng(seed, 1, b, i) for i in lines]
+    pattern = k % 4
+    series = np.empty((len(lines), n))
+
+    if pattern == 0:
+        base = np.cumsum(shared.normal(0, 0.5, n))
+        for j, rng in enumerate(own):
+            series[j] = base + rng.normal(0, 0.2, n)
+    elif pattern in (1, 2):
+        lead = np.cumsum(shared.normal(0, 0.2, n))
+        lag = np.roll(lead if pattern == 1 else -lead, 1)
+        lag[0] = lag[1] if n > 1 else lag[0]
+        series[:] = [lead, lag][:len(lines)]
+    else:
+        for j, rng in enumerate(own):
+            series[j] = np.cumsum(rng.normal(0, 0.2, n))
+    return series
+
+
+def volume_forecasts(
+    path: str,
+    business_units: int = 2,
+    service_lines: int = 8,
+    freq: str = 'monthly',
+    years: float = 2.25,
+    start: str = '2023-01-01',
+    future_periods: int = 3,
+    seed: int = 42,
+    chunk_rows: int = CHUNK_ROWS,
+    format: str | None = None,
+) -> int:
+    """
+    Write a `volume_forecasts` dataset: one series of actual and forecast
+    volumes per business unit and service line.
+
+    Parameters
+    ----------
+    path : str
+        The CSV or Parquet file to write.
+    business_units, service_lines : int
+        Number of business units, and of service lines in each.
+    freq : str
+        'daily', 'monthly' or a pandas frequency.
+    years : float
+        Length of every series, from `start`.
+    future_periods : int
+        Number of trailing periods with a forecast but no actual volume yet.
+    seed : int
+        Seed of all random streams.
+    chunk_rows : int
+        About how many rows to generate and write at a time.
+    format : str
+        'csv' or 'parquet'; by default from the extension of `path`.
+
+    Returns
+    -------
+    int
+        The number of rows written.
+    """
+    import pyarrow as pa
+
+    dates = _dates(start, years, freq)
+    n = len(dates)
+    hierarchy = structure(service_lines)
+    stream_of = {ss: stream for stream, sub_streams in hierarchy['stream'].items() for ss in sub_streams}
+    sub_streams = list(hierarchy['sub_stream'])
+    streams = list(hierarchy['stream'])
+
+    date_column = pa.array(dates.values.astype('datetime64[D]'))
+    year_column = pa.array(dates.year.to_numpy(dtype=np.int64))
+    month_column = _strings(MONTH_NAMES, dates.month.to_numpy() - 1)
+    observed = np.arange(n) < n - future_periods
+
+    schema = pa.schema([
+        ('date', pa.date32()), ('service_line', pa.string()), ('volume', pa.float64()),
+        ('forecast', pa.float64()), ('sub_stream', pa.string()), ('stream', pa.string()),
+        ('business_unit', pa.string()), ('year', pa.int64()), ('month', pa.string()),
+    ])
+    line_names = [f"service_line_{i + 1}" for i in range(service_lines)]
+    unit_names = [_business_unit(b) for b in range(business_units)]
+    stream_index = [streams.index(stream_of[ss]) for ss in sub_streams]
+
+    def batches():
+        # (business unit, sub stream) pairs, grouped so a batch holds about
+        # `chunk_rows` rows.
+        batch, rows = [], 0
+        for b in range(business_units):
+            for k, ss in enumerate(sub_streams):
+                batch.append((b, k))
+                rows += n * len(hierarchy['sub_stream'][ss])
+                if rows >= chunk_rows:
+                    yield batch
+                    batch, rows = [], 0
+        if batch:
+            yield batch
+
+    written = 0
+    with _writer(path, schema, format) as write:
+        for batch in batches():
+            logs, units, lines, subs = [], [], [], []
+            for b, k in batch:
+                members = [2 * k + j for j in range(len(hierarchy['sub_stream'][sub_streams[k]]))]
+                logs.append(_sub_stream_series(seed, b, k, members, n))
+                units += [b] * len(members)
+                lines += members
+                subs += [k] * len(members)
+            log_volume = np.vstack(logs)
+
+            noise = np.vstack([_rng(seed, 2, b, i).normal(0, 0.2, n) for b, i in zip(units, lines)]).round(2)
+            volume = 100 * np.exp(log_volume)
+            forecast = 100 * np.exp(log_volume + noise)
+
+            m = len(lines)
+
+            def per_row(values):
+                return np.repeat(np.asarray(values), n)
+
+            table = pa.Table.from_arrays([
+                pa.concat_arrays([date_column] * m),
+                _strings(line_names, per_row(lines)),
+                pa.array(volume.ravel(), mask=~np.tile(observed, m)),
+                pa.array(forecast.ravel()),
+                _strings(sub_streams, per_row(subs)),
+                _strings(streams, per_row([stream_index[k] for k in subs])),
+                _strings(unit_names, per_row(units)),
+                pa.concat_arrays([year_column] * m),
+                pa.concat_arrays([month_column] * m),
+            ], schema=schema)
+            write(table)
+            written += table.num_rows
+    return written
+
+
+def _metric_values(rng: np.random.Generator, kind: str, low: float, high: float, n: int) -> np.ndarray:
+    if kind == 'integer':
+        return rng.integers(low, high + 1, n).astype(float)
+    values = rng.uniform(low, high, n)
+    if kind == 'smoothed':
+        # Trailing mean over up to 3 periods, like a rolling(3, min_periods=1).
+        total = np.cumsum(values)
+        total[3:] = total[3:] - total[:-3]
+        values = total / np.minimum(np.arange(1, n + 1), 3)
+    return values
+
+
+def _metric(i: int, described: dict) -> tuple:
+    name, kind, low, high = METRICS[i % len(METRICS)]
+    if i >= len(METRICS):
+        name = f"Metric {i + 1} ({name})"
+    info = described.get(name) or {'description': f"Synthetic metric shaped like {METRICS[i % len(METRICS)][0]}.", 'owner': 'Synthetic'}
+    return name, kind, low, high, info
+
+
+def _shipped_metrics() -> dict:
+    import yaml
+
+    with open(os.path.join(_HERE, 'business_metrics', 'metrics.yaml'), 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f) or {}
+
+
+def business_metrics(
+    path: str,
+    metrics: int = 11,
+    freq: str = 'monthly',
+    years: float = 3.5,
+    start: str = '2022-01-01',
+    seed: int = 42,
+    chunk_rows: int = CHUNK_ROWS,
+    format: str | None = None,
+) -> int:
+    """
+    Write a `business_metrics` dataset: one series per metric, each value
+    listed once under its calendar period and once under its fiscal period.
+
+    Parameters
+    ----------
+    path : str
+        The CSV or Parquet file to write.
+    metrics : int
+        Number of metrics; the first 11 are the shipped ones.
+    freq : str
+        'daily', 'monthly' or a pandas frequency.
+    years : float
+        Length of every series, from `start`.
+    seed : int
+        Seed of all random streams.
+    chunk_rows : int
+        About how many rows to generate and write at a time.
+    format : str
+        'csv' or 'parquet'; by default from the extension of `path`.
+
+    Returns
+    -------
+    int
+        The number of rows written.
+    """
+    import pyarrow as pa
+
+    dates = _dates(start, years, freq)
+    n = len(dates)
+    described = _shipped_metrics()
+
+    year, month = dates.year.to_numpy(), dates.month.to_numpy()
+    period_values = (
+        [f"{y}_{MONTH_NAMES[mo - 1]}" for y, mo in zip(year, month)]
+        + [f"FY{y - mo // 7}_Q{(mo - 1) // 3 + 1}" for y, mo in zip(year, month)]
+    )
+    date_column = pa.array(np.tile(dates.values.astype('datetime64[D]'), 2))
+    period_type_column = _strings(['Calendar Period', 'Fiscal Period'], np.repeat([0, 1], n))
+    period_value_column = _strings(period_values, np.arange(2 * n))
+
+    schema = pa.schema([
+        ('date', pa.date32()), ('metric_name', pa.string()), ('metric_description', pa.string()),
+        ('metric_owner', pa.string()), ('metric_value', pa.float64()),
+        ('period_type', pa.string()), ('period_value', pa.string()),
+    ])
+    per_batch = max(1, chunk_rows // (2 * n))
+
+    written = 0
+    with _writer(path, schema, format) as write:
+        for first in range(0, metrics, per_batch):
+            batch = [_metric(i, described) for i in range(first, min(first + per_batch, metrics))]
+            values = np.vstack([_metric_values(_rng(seed, i), kind, low, high, n) for i, (_, kind, low, high, _) in zip(range(first, metrics), batch)])
+
+            m = len(batch)
+            per_row = np.repeat(np.arange(m), 2 * n)
+            table = pa.Table.from_arrays([
+                pa.concat_arrays([date_column] * m),
+                _strings([b[0] for b in batch], per_row),
+                _strings([b[4]['description'] for b in batch], per_row),
+                _strings([b[4]['owner'] for b in batch], per_row),
+                pa.array(np.hstack([values, values]).ravel()),
+                pa.concat_arrays([period_type_column] * m),
+                pa.concat_arrays([period_value_column] * m),
+            ], schema=schema)
+            write(table)
+            written += table.num_rows
+    return written
+
+
+GENERATORS = {
+    'volume_forecasts': volume_forecasts,
+    'business_metrics': business_metrics,
+}
+
+
+def dataset(root: str, name: str, **params) -> int:
+    """
+    Write a dataset folder the catalog can load: the generated `data.csv`,
+    the shipped `description.md`, and a YAML configuration matching the
+    generated data.
+
+    Returns
+    -------
+    int
+        The number of rows written.
+    """
+    import yaml
+
+    os.makedirs(root, exist_ok=True)
+    shutil.copyfile(os.path.join(_HERE, name, 'description.md'), os.path.join(root, 'description.md'))
+
+    if name == 'volume_forecasts':
+        with open(os.path.join(root, 'structure.yaml'), 'w', encoding='utf-8') as f:
+            yaml.safe_dump(structure(params.get('service_lines', 8)), f, sort_keys=False)
+    else:
+        described = _shipped_metrics()
+        metrics = [_metric(i, described) for i in range(params.get('metrics', 11))]
+        with open(os.path.join(root, 'metrics.yaml'), 'w', encoding='utf-8') as f:
+            yaml.safe_dump({m[0]: m[4] for m in metrics}, f, sort_keys=False, allow_unicode=True)
+
+    # Written under a temporary name, so the catalog never picks up half a file.
+    tmp = os.path.join(root, '.data.csv.tmp')
+    rows = GENERATORS[name](tmp, format='csv', **params)
+    os.replace(tmp, os.path.join(root, 'data.csv'))
+    return rows
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('dataset', choices=sorted(GENERATORS))
+    parser.add_argument('output', help='a .csv or .parquet file, or a dataset folder')
+    parser.add_argument('--business-units', type=int, help='volume_forecasts only')
+    parser.add_argument('--service-lines', type=int, help='volume_forecasts only')
+    parser.add_argument('--metrics', type=int, help='business_metrics only')
+    parser.add_argument('--freq', choices=sorted(FREQUENCIES))
+    parser.add_argument('--years', type=float)
+    parser.add_argument('--start')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--chunk-rows', type=int)
+    args = parser.parse_args(argv)
+
+    params = {
+        key: value for key, value in vars(args).items()
+        if key not in ('dataset', 'output') and value is not None
+    }
+    if args.output.endswith(('.csv', '.parquet')):
+        rows = GENERATORS[args.dataset](args.output, **params)
+    else:
+        rows = dataset(args.output, args.dataset, **params)
+    print(f"wrote {rows:,} rows to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
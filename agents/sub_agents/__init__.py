@@ -1,2 +1,4 @@
+from .datasets import dataset_agents
+from .fanout import all_datasets_agent
 from .business_metrics import business_metrics_agent
-from .volume_forecasts import volume_forecasts_agent
\ No newline at end of file
+from .volume_forecasts import volume_forecasts_agent
@@ -0,0 +1,41 @@
+from google.adk.agents import Agent
+import os
+
+from ..tools import DataToolset, get_catalog
+from ..tools.rollups import ROLLUPS
+
+DATABASE_PATH = os.path.join(os.path.dirname(__file__), '..', 'database')
+
+# Every dataset directory in the database folder shares one catalog, and gets
+# a toolset and a sub-agent without needing a module of its own.
+catalog = get_catalog(DATABASE_PATH)
+
+
+def build_agent(toolset: DataToolset, name: str | None = None, **kwargs) -> Agent:
+    """
+    Build the sub-agent of a dataset. An agent can only have one parent, so
+    every other place the dataset's agent is needed gets its own instance,
+    under its own `name`, sharing the toolset. Other keyword arguments are
+    passed on to `Agent`.
+    """
+    return Agent(
+        name = name or toolset.agent_name,
+        model = 'gemini-2.0-flash',
+        description = toolset.description,
+        instruction = toolset.instruction_provider,
+        tools=[toolset.query_tool, toolset.page_tool, toolset.plot_tool, toolset.forecast_tool, toolset.forecast_batch_tool]
+            + ([toolset.backtest_tool] if toolset.table_name in ROLLUPS else []),
+        output_key=f'{toolset.table_name}_out',
+        **kwargs,
+    )
+
+
+toolsets = {
+    name: DataToolset(catalog.path(name), catalog=catalog)
+    for name in catalog.datasets()
+}
+
+dataset_agents = {
+    name: build_agent(toolset)
+    for name, toolset in toolsets.items()
+}
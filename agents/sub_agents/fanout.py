@@ -0,0 +1,65 @@
+import warnings
+
+from google.adk.agents import Agent, ParallelAgent, SequentialAgent
+
+from .datasets import build_agent, toolsets
+
+
+def build_fanout_agent(toolsets: dict) -> SequentialAgent:
+    """
+    Build an agent that asks every dataset's agent the user's question at the
+    same time, then merges their answers.
+
+    The dataset agents run in parallel, each on its own branch, and leave their
+    answers in the session state under their `output_key`; the merge agent
+    reads them back through its instruction. A question needing several
+    datasets so takes as long as the slowest of them rather than their sum.
+    """
+    outputs = '\n        '.join(f"<{name}>{{{name}_out?}}</{name}>" for name in toolsets)
+    merge_agent = Agent(
+        name='merge_agent',
+        model='gemini-2.0-flash',
+        description='Merges the answers of the dataset agents into one response.',
+        instruction=f"""
+        <task>Answer the user's question by combining the answers below, each from the agent of one dataset.</task>
+        <answers>
+        {outputs}
+        </answers>
+        <response_guide>
+        <can_do>Relate the datasets to each other where the question asks for it, e.g. metrics against volumes over the same periods.</can_do>
+        <can_do>Keep the figures, tables and plot references of the answers as they are.</can_do>
+        <never_do>Never make up figures that are not in the answers.</never_do>
+        <never_do>Never mention the agents; present one answer.</never_do>
+        </response_guide>
+        """,
+    )
+
+    # ParallelAgent and SequentialAgent are deprecated in favour of Workflow,
+    # which can't be the sub-agent of an LLM agent yet.
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        fanout = ParallelAgent(
+            name='datasets_fanout',
+            description='Asks the agent of every dataset at the same time.',
+            # Each copy answers on its own branch: handing the question to the
+            # root agent or to another dataset's agent from there would run
+            # outside the fan-out and leave its answer missing from the merge.
+            sub_agents=[
+                build_agent(
+                    toolset, name=f"{name}_parallel_agent",
+                    disallow_transfer_to_parent=True, disallow_transfer_to_peers=True,
+                )
+                for name, toolset in toolsets.items()
+            ],
+        )
+        return SequentialAgent(
+            name='all_datasets_agent',
+            description=(
+                'Answers questions that need more than one dataset, by querying all of them '
+                f"({', '.join(toolsets)}) at the same time and merging the answers."
+            ),
+            sub_agents=[fanout, merge_agent],
+        )
+
+
+all_datasets_agent = build_fanout_agent(toolsets)
@@ -1,21 +1,5 @@
-from google.adk.agents import Agent
-import os
+from .datasets import dataset_agents, toolsets
 
-from ..tools import DataToolset
+vf = toolsets['volume_forecasts']
 
-vf_path = os.path.join(
-    os.path.dirname(__file__),
-    '..', 'database', 'volume_forecasts'
-)
-
-vf = DataToolset(vf_path)
-
-
-volume_forecasts_agent = Agent(
-    name = vf.agent_name,
-    model = 'gemini-2.0-flash',
-    description = vf.description,
-    instruction = vf.instruction,
-    tools=[vf.query_tool, vf.plot_tool, vf.forecast_tool],
-    output_key='volume_forecasts_out'
-)
+volume_forecasts_agent = dataset_agents['volume_forecasts']
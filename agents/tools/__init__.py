@@ -1,47 +1,110 @@
-import duckdb
+import asyncio
+import functools
 import markdown
-import yaml
 import os 
 import glob
 
-
-import seaborn as sns
-
-sns.set_style('whitegrid')
-
-import pandas as pd
-
-import matplotlib.pyplot as plt
-
-from .visualisation import _save_plot
-from .simulation import _forecast
+from .cache import ResultCache, _result_handle
+from .catalog import Catalog, get_catalog
+from .engine import DataEngine, _fetch_arrow, _is_truncated
+from . import executor
+from .executor import _run_in_process, _run_in_thread
+from .governance import QueryError, QueryPolicy, QueryTooCostly, _estimate_cost, _failure, _governed
+from .instrumentation import span
+from .paging import _page, _source, _summarize
+from .reduction import _columns, _reduce_categorical, _reduce_distribution, _reduce_relation
+from .rollups import ROLLUPS
+from .schema import _schema_instruction
+from .visualisation import RenderOptions, _render_plot, _save_plot
 
 from google.adk.tools import ToolContext
 
 class DataToolset:
-    def __init__(self, path: str):
-        self.table_name = path.split('/')[-1]
+    def __init__(
+        self,
+        path: str,
+        catalog: Catalog | None = None,
+        scope: list[str] | None = None,
+        cache_bytes: int = 256 * 1024 * 1024,
+        results_bytes: int = 256 * 1024 * 1024,
+        max_result_bytes: int = 64 * 1024 * 1024,
+        page_rows: int = 100,
+        page_bytes: int = 32 * 1024,
+        render_options: RenderOptions = RenderOptions(),
+        max_plot_points: int = 5000,
+        query_policy: QueryPolicy = QueryPolicy(),
+    ):
+        self.path = os.path.normpath(path)
+        self.table_name = os.path.basename(self.path)
         self.agent_name = self.table_name + '_agent'
-        self.csv_path = f"{path}/data.csv"      
-        self.confs = {}
-
-        with open(f"{path}/description.md", "r", encoding="utf-8") as f:
-            self.description = markdown.markdown(f.read())
-
+        self.csv_path = f"{self.path}/data.csv"
+        # Datasets live in a catalog shared by every toolset on the same
+        # database folder, which is where the other datasets come from.
+        self.catalog = catalog or get_catalog(os.path.dirname(self.path))
+        self.engine = DataEngine(self.catalog, self.table_name, scope)
+        self.cache = ResultCache(cache_bytes)
+        # Results registered under a handle, so other tools can pick them up
+        # without re-running the query.
+        self.results = ResultCache(results_bytes)
+        # Results larger than this are not materialised; they are paged and
+        # summarised by DuckDB directly instead.
+        self.max_result_bytes = max_result_bytes
+        self.page_rows = page_rows
+        self.page_bytes = page_bytes
+        self.render_options = render_options
+        # Plots are reduced to about this many points before rendering.
+        self.max_plot_points = max_plot_points
+        self.query_policy = query_policy
+        self.catalog.configure(memory_limit=query_policy.memory_limit, threads=query_policy.threads)
+
+        # The agent needs its description up front; the YAML configuration and
+        # the instruction are only built on first use. A dataset dropped in
+        # without a description still gets an agent, described generically;
+        # its instruction lists the columns either way.
+        try:
+            with open(f"{path}/description.md", "r", encoding="utf-8") as f:
+                self.description = markdown.markdown(f.read())
+        except FileNotFoundError:
+            self.description = markdown.markdown(f"The `{self.table_name}` dataset.")
+        # (data version, instruction) it was built for.
+        self._instruction = None
+
+    @functools.cached_property
+    def confs(self) -> dict:
+        """
+        The dataset's YAML configuration files, parsed on first use.
+        """
+        import yaml
 
-        yaml_files = glob.glob(os.path.join(path, "*.yaml")) + glob.glob(os.path.join(path, "*.yml"))
+        confs = {}
+        yaml_files = glob.glob(os.path.join(self.path, "*.yaml")) + glob.glob(os.path.join(self.path, "*.yml"))
         for yaml_file in yaml_files:
             name = yaml_file.split('/')[-1]
             with open(yaml_file, "r", encoding="utf-8") as f:
-                self.confs[name] = yaml.safe_load(f)
-        
+                confs[name] = yaml.safe_load(f)
+        return confs
 
-        self.instruction = (f"""<purpose>
+    @property
+    def instruction(self) -> str:
+        """
+        The agent's instruction, rebuilt whenever the data changes, as it
+        includes the schema and statistics of the datasets.
+        """
+        with self.engine.cursor():
+            version = self.engine.version
+        if self._instruction is None or self._instruction[0] != version:
+            self._instruction = (version, self._build_instruction())
+        return self._instruction[1]
+
+    def _build_instruction(self) -> str:
+        return (f"""<purpose>
             Use this tool to get data or metrics from
             <table_name>{self.table_name}</table_name>,
             which is about
             <data_description>{self.description}</data_description>
             </purpose>
+            {self._schema_instruction()}
+            {self._rollup_instruction()}
             <query_requirements>
             - Use DuckDB-compliant SQL syntax, especially for dates:
                 - Example: `WHERE date_column = DATE '2023-01-01'`
@@ -63,30 +126,241 @@ class DataToolset:
             <can_do>Add emojis through out the reponse to make it look pretty</can_do>
             <can_do>When comparing in visualisation for categorical values, plot them in one plot</can_do>
             <can_do>Use hue, col then row in that order to compare categorical features.</can_do>
+            <can_do>Rely on the summary returned by the query tool, and only page through rows when you need them.</can_do>
+            <can_do>Pass the handle returned by the query tool to the plot and forecast tools instead of repeating the SQL query.</can_do>
             <can_do>Always respond only in English</can_do>
             <response_guide>
             """
         )
 
+    def _schema_instruction(self) -> str:
+        indent = '\n' + ' ' * 12
+        schema = _schema_instruction(self.catalog.schema(self.table_name)).replace('\n', indent)
+        others = indent.join(
+            _schema_instruction(self.catalog.schema(t), values=False)
+            for t in self.engine.datasets() if t != self.table_name
+        )
+        return f"""<schema>
+            The columns of {self.table_name}, with their types, ranges and, for categorical columns, every value
+            as spelled in the data. Use these exact column names and values rather than guessing them.
+            {schema}
+            </schema>
+            <joinable_tables>
+            Other tables that can be queried and joined with it in the same query:
+            {others or 'none'}
+            </joinable_tables>"""
+
+    def _rollup_instruction(self) -> str:
+        rollups = [r for r in self.engine.rollups() if r.dataset == self.table_name]
+        if not rollups:
+            return ''
+        tables = '\n            '.join(f"- {r.table}: one row per {', '.join(r.dimensions)}" for r in rollups)
+        return f"""<rollup_tables>
+            Pre-aggregated tables of {self.table_name}, each holding the sums of {' and '.join(rollups[0].measures)}
+            plus n_rows, n_actual, n_error, error, abs_error and squared_error (sums of forecast minus actual
+            over rows with both values). Aggregate queries on {self.table_name} are answered from them
+            automatically; query them directly for forecast accuracy, e.g. sum(abs_error) / sum({rollups[0].measures[0]}).
+            For MAPE, WAPE and bias across the hierarchy, or to check whether refitting a forecasting model
+            would have beaten the planned forecast, use the backtest tool rather than writing the SQL.
+            {tables}
+            </rollup_tables>"""
+
+    async def instruction_provider(self, context) -> str:
+        """
+        Instruction provider for the agent, so the instruction is only built
+        when the agent first runs rather than at import time, and is current
+        with the data on every turn.
+
+        Checking the data for changes, and loading and profiling it on first
+        use, is blocking work, so it runs on the thread pool.
+        """
+        return await _run_in_thread(lambda: self.instruction)
 
-    def query_tool(self, sql_query: str):
+    async def _run_query(self, fn, *args):
+        """
+        Run blocking work that queries DuckDB on the thread pool, under the
+        toolset's query policy.
         """
-        Execute a one-off SQL query on a CSV file using DuckDB, returning the results as a dictionary.
+        return await _run_in_thread(_governed, self.query_policy.timeout, fn, *args)
+
+    def _execute(self, sql_query: str, max_bytes: int | None = None) -> tuple:
+        sql_query = sql_query.replace('`', '')
 
-        This function leverages DuckDB's built-in support for querying CSV files using SQL. 
-        It is intended for single-use queries where performance, simplicity, and compatibility 
-        with local data files are important.
+        version, con = self.engine.checkout()
+        with con, span('query.execute', dataset=self.table_name) as s:
+            self.engine.validate(con, sql_query)
+            version = self.engine.version_of(con, sql_query)
+            key = self.cache.key(sql_query, version)
+            table = self.cache.get(key)
+            s.set(cache_hit=table is not None)
+            if table is None:
+                routed = self.engine.route(con, sql_query)
+                s.set(routed=routed != sql_query)
+                policy = self.query_policy
+                cost = _estimate_cost(con, routed, self.engine.arrow_rows(routed))
+                if cost > policy.max_cost:
+                    raise QueryTooCostly(
+                        f"The query is estimated to process about {cost:,.0f} rows, over the limit of {policy.max_cost:,.0f}."
+                    )
+                table = _fetch_arrow(con, routed, max_bytes, policy.max_rows, policy.max_bytes)
+                if table is not None:
+                    self.cache.put(key, table)
+            if table is not None:
+                s.set(rows=table.num_rows, result_bytes=table.nbytes)
+        return version, table
+
+    def _register(self, sql_query: str, version: str, table, summary: dict, num_rows: int, tool_context: ToolContext) -> str:
+        handle = _result_handle(sql_query, version)
+        if table is not None:
+            self.results.put((handle,), table)
+
+        # Only a small, serialisable description goes into the session state;
+        # the data itself stays in this process.
+        tool_context.state[f"{self.table_name}:{handle}"] = {
+            'sql_query': sql_query,
+            'version': version,
+            'columns': list(summary),
+            'num_rows': num_rows,
+        }
+        return handle
+
+    def _query(self, sql_query: str) -> tuple:
+        version, table = self._execute(sql_query, self.max_result_bytes)
+        truncated = _is_truncated(table)
+        with self.engine.cursor() as con, span('query.summarize', materialised=table is not None):
+            if table is not None:
+                num_rows, summary = _summarize(con, sql_query, table)
+            else:
+                # Results too large to hold are summarised in DuckDB, cut to
+                # the row limit like the ones that are held. One row past it
+                # tells whether there are more, in which case the summary is
+                # taken again without it.
+                max_rows = self.query_policy.max_rows
+                source = _source(con, sql_query, None)
+                num_rows, summary = _summarize(con, f"SELECT * FROM {source} LIMIT {max_rows + 1}", None)
+                truncated = num_rows > max_rows
+                if truncated:
+                    num_rows, summary = _summarize(con, f"SELECT * FROM {source} LIMIT {max_rows}", None)
+        return version, table, num_rows, summary, truncated
+
+    def _page_result(self, handle: str, sql_query: str, table, offset: int, num_rows: int) -> dict:
+        with self.engine.cursor() as con:
+            # Truncated results that aren't held end at `num_rows`, not at the end of the query.
+            page = _page(con, sql_query, table, offset, min(self.page_rows, max(0, num_rows - offset)), self.page_bytes)
+
+        end = offset + page.num_rows
+        return {
+            'handle': handle,
+            'num_rows': num_rows,
+            'offset': offset,
+            'data': page.to_pandas(date_as_object=False).to_dict('list'),
+            'next_cursor': f"{handle}:{end}" if end < num_rows else None,
+        }
+
+    def _lookup(self, sql_query: str, tool_context: ToolContext) -> tuple:
+        """
+        Return the SQL behind a result handle registered by `query_tool` and its
+        materialised result if it is still held, or `sql_query` itself if it is
+        not a known handle.
+        """
+        handle = sql_query.strip()
+        entry = tool_context.state.get(f"{self.table_name}:{handle}")
+
+        if entry is None:
+            return sql_query.replace('`', ''), None
+        # The result may have been evicted since it was registered, in which
+        # case the original query is run again.
+        return entry['sql_query'], self.results.get((handle,))
+
+    def _resolve(self, sql_query: str, tool_context: ToolContext) -> 'pd.DataFrame':
+        """
+        Return the data for a result handle registered by `query_tool`, or run
+        `sql_query` if it is not a known handle.
+        """
+        sql_query, table = self._lookup(sql_query, tool_context)
+        if table is None:
+            _, table = self._execute(sql_query)
+
+        return table.to_pandas(date_as_object=False)
+
+    def _plot_data(self, sql_query: str, plot_type: str, x: str, y: str, hue: str, col: str, row: str, kind: str, tool_context: ToolContext) -> tuple:
+        """
+        Return the data to draw a plot from, reduced to about `max_plot_points` rows.
+
+        Categorical plots are aggregated or sampled in DuckDB, so large results are
+        never loaded into pandas; relational plots are downsampled per series and
+        distribution plots pre-binned.
+
+        Returns
+        -------
+        tuple
+            The data, keyword arguments overriding those passed to seaborn, and the
+            number of rows before reduction.
+        """
+        sql_query, table = self._lookup(sql_query, tool_context)
+        if table is None:
+            _, table = self._execute(sql_query, self.max_result_bytes)
+
+        with self.engine.cursor() as con:
+            source = _source(con, sql_query, table)
+            num_rows = table.num_rows if table is not None else con.execute(f"SELECT count(*) FROM {source}").fetchone()[0]
+            columns = [d[0] for d in con.execute(f"SELECT * FROM {source} LIMIT 0").description]
+            groups = [c for c in _columns(columns, hue, col, row) if c not in (x, y)]
+
+            if plot_type == 'categorical' and num_rows > self.max_plot_points:
+                data, overrides = _reduce_categorical(con, source, kind, x, y, groups, self.max_plot_points)
+                return data, overrides, num_rows
+
+        if table is None:
+            _, table = self._execute(sql_query)
+        data = table.to_pandas(date_as_object=False)
+
+        if plot_type == 'relation':
+            data, overrides = _reduce_relation(data, x, y, kind, groups, self.max_plot_points)
+            return data, overrides, num_rows
+        if plot_type == 'distribution':
+            data, overrides = _reduce_distribution(data, x, y, kind, groups, self.max_plot_points)
+            return data, overrides, num_rows
+        return data, {}, num_rows
+
+    async def query_tool(self, sql_query: str, tool_context: ToolContext):
+        """
+        Execute a SQL query on the dataset using DuckDB, returning the results as a dictionary.
+
+        The dataset is loaded once into a long-lived DuckDB table and reloaded only when
+        the underlying CSV file changes, so each call only pays for the query itself.
+        Every dataset in the database folder is a table in the same database, so the
+        query can join this dataset with the other tables listed in the instructions.
+        Only SELECT queries can be run.
+        Results of repeated queries are served from an in-memory cache.
+
+        Only the first page of rows is returned, together with the total row count and a
+        per-column summary (count, min, max and approximate distinct count) computed over the whole
+        result. Use `page_tool` with `next_cursor` to read further rows. Results over the
+        row limit are cut to their first rows; `truncated` is then True, and the row count,
+        summary and pages only cover the rows kept.
+
+        Every result is registered under a short handle. Pass the handle to `plot_tool`
+        or `forecast_tool` in place of the SQL query to reuse the result without
+        running the query again.
 
         Parameters:
         -----------
         sql_query : str
             The SQL query to execute. The query must follow DuckDB SQL syntax. You might need to add explicit type casts.
+        tool_context : ToolContext
+            Context object holding the session state the result handle is registered in.
 
         Returns:
         --------
         dict
-            Query result formatted as a dictionary, where keys are column names and values are lists 
-            of column data.
+            A dictionary with the result `handle`, the total `num_rows`, the first page of rows
+            under `data` (keys are column names and values are lists of column data), the
+            column `summary`, a `next_cursor` for the following page (None if there is none) and
+            whether the result was `truncated` at the row limit.
+            Queries that are not allowed, too costly, too slow or return too much data are not
+            run (or are stopped) and return a dictionary with `status` 'failure', a `reason`,
+            the `error` and a `hint` on how to change the query.
 
         Notes:
         ------
@@ -103,16 +377,50 @@ class DataToolset:
         """
 
         sql_query = sql_query.replace('`', '')
+        with span('tool.query', dataset=self.table_name) as s:
+            try:
+                version, table, num_rows, summary, truncated = await self._run_query(self._query, sql_query)
+                handle = self._register(sql_query, version, table, summary, num_rows, tool_context)
+                result = await self._run_query(self._page_result, handle, sql_query, table, 0, num_rows)
+            except QueryError as e:
+                s.set(failure=e.reason)
+                return _failure(e)
+
+            s.set(rows=num_rows, result_bytes=table.nbytes if table is not None else None)
+            result['summary'] = summary
+            result['truncated'] = truncated
+            return result
+
+    async def page_tool(self, cursor: str, tool_context: ToolContext):
+        """
+        Fetch the next page of rows of an earlier `query_tool` result.
 
-        with duckdb.connect(database=":memory:") as con:
-            # Load data as a temporary in-memory table
-            con.execute(f"""
-                CREATE TABLE {self.table_name} AS 
-                SELECT * FROM read_csv_auto('{self.csv_path}', HEADER=TRUE);
-            """)
-            
-            result = con.execute(sql_query).df().to_dict('list')
-        return result
+        Parameters
+        ----------
+        cursor : str
+            The `next_cursor` value returned by `query_tool` or by a previous call to this tool.
+        tool_context : ToolContext
+            Context object holding the session state the result handle is registered in.
+
+        Returns
+        -------
+        dict
+            A dictionary with the rows of the page under `data`, and `next_cursor` to fetch the
+            page after it (None once the last page has been returned).
+        """
+        handle, _, offset = cursor.strip().rpartition(':')
+        entry = tool_context.state.get(f"{self.table_name}:{handle}")
+        if entry is None or not offset.isdigit():
+            return {
+                'status': 'failure',
+                'error': f"Unknown cursor '{cursor}', run the query again with the query tool."
+            }
+
+        table = self.results.get((handle,))
+        try:
+            return await self._run_query(self._page_result, handle, entry['sql_query'], table, int(offset), entry['num_rows'])
+        except QueryError as e:
+            return _failure(e)
 
     async def plot_tool(self, sql_query: str, title: str, x: str, y: str, hue: str, col: str, row: str, kind: str, plot_type: str, tool_context: ToolContext):
         """
@@ -121,7 +429,8 @@ class DataToolset:
         Parameters
         ----------
         sql_query : str
-            A DuckDB-compatible SQL query used to retrieve data. You might need to add explicit type casts.
+            A result handle returned by `query_tool`, or a DuckDB-compatible SQL query used to
+            retrieve data. You might need to add explicit type casts.
         title : str
             The title for the resulting plot.
         x : str
@@ -144,10 +453,15 @@ class DataToolset:
         Returns
         -------
         dict
-            A dictionary containing metadata or references to the saved visualization.
+            A dictionary containing metadata or references to the saved visualization,
+            and a `note` saying how the data was reduced if it was.
 
         Notes
         -----
+        - Large results are reduced before drawing: lines are averaged per x value and
+          downsampled per series, distributions pre-binned and categorical plots aggregated,
+          so there is no need to aggregate in SQL only to keep the plot small. Aggregated
+          plots are drawn without error bars or confidence bands.
         - Use DuckDB-compliant SQL syntax, especially for dates:
             - Example: `WHERE date_column = DATE '2023-01-01'`
             - Example: `WHERE date_column >= CURRENT_DATE - INTERVAL '7 days'`
@@ -158,49 +472,64 @@ class DataToolset:
         """
         
 
-        data = self.query_tool(sql_query)
-
-        data_df = pd.DataFrame(data)
-        num_points = len(data_df)
-
-        # Base dimensions
-        base_height = 5
-        max_height = 10
-        min_aspect = 2.5
-        max_aspect = 4.5
-
-        # Adjust height modestly based on the number of rows (up to a point)
-        height = min(base_height + num_points / 500, max_height)
-
-        # Compute aspect ratio based on data spread, but clamp it
-        aspect = min(max((num_points / 100), min_aspect), max_aspect)
-
-        SNS_PLOTS = {
-            'relation': sns.relplot,
-            'categorical': sns.catplot,
-            'distribution': sns.displot
-        }
-
-        sns_plot = SNS_PLOTS[plot_type](data=data, x=x, y=y, hue=hue, col=col, row=row, kind=kind, height=height, aspect=aspect)
-
-        sns_plot.fig.suptitle(title, fontsize=13, y=1.03)  # adjust `y` as needed
-
-        
-        return await _save_plot(title, sns_plot, tool_context)
-
-
-    def forecast_tool(self, sql_query: str, value_column: str, date_column: str, forecast_horizon: int, freq: str):
+        with span('tool.plot', dataset=self.table_name, plot_type=plot_type, kind=kind) as s:
+            try:
+                with span('plot.data'):
+                    data, overrides, num_points = await self._run_query(
+                        self._plot_data, sql_query, plot_type, x, y, hue, col, row, kind, tool_context
+                    )
+            except QueryError as e:
+                s.set(failure=e.reason)
+                return _failure(e)
+            s.set(rows=num_points, points=len(data))
+
+            # Base dimensions
+            base_height = 5
+            max_height = 10
+            min_aspect = 2.5
+            max_aspect = 4.5
+
+            # Adjust height modestly based on the number of rows (up to a point)
+            height = min(base_height + num_points / 500, max_height)
+
+            # Compute aspect ratio based on data spread, but clamp it
+            aspect = min(max((num_points / 100), min_aspect), max_aspect)
+
+            # Rendering and PNG encoding are CPU-bound, keep them off the event loop.
+            plot_kwargs = dict(x=x, y=y, hue=hue, col=col, row=row, kind=kind)
+            plot_kwargs.update(overrides)
+
+            image = await _run_in_process(
+                _render_plot, data, plot_type, title, height, aspect, self.render_options, **plot_kwargs
+            )
+
+            result = await _save_plot(title, image, tool_context, self.render_options)
+            if len(data) < num_points and result.get('status') == 'success':
+                result['note'] = f"Drawn from {len(data):,} points summarising {num_points:,} rows"
+                if 'errorbar' in overrides and overrides['errorbar'] is None:
+                    result['note'] += ", without error bars or confidence bands"
+                result['note'] += '.'
+            return result
+
+
+    async def forecast_tool(self, sql_query: str, value_column: str, date_column: str, forecast_horizon: int, freq: str, method: str, tool_context: ToolContext):
         """
         Executes a DuckDB SQL query, extracts specified columns, and generates a plot.
 
         Parameters
         ----------
         sql_query : str
-            A DuckDB-compatible SQL query used to retrieve data. You might need to add explicit type casts.
+            A result handle returned by `query_tool`, or a DuckDB-compatible SQL query used to
+            retrieve data. You might need to add explicit type casts.
         forecast_horizon : int
             Number of future periods to forecast.
         freq : str
             Frequency of the data (e.g., 'M' for monthly, 'D' for daily).
+        method : str
+            Forecasting engine: 'prophet', 'ets' (exponential smoothing with damped trend),
+            'seasonal_naive', or 'auto' to let the tool pick. Use 'auto' unless asked otherwise.
+        tool_context : ToolContext
+            Context object holding the session state result handles are registered in.
 
         Returns
         -------
@@ -218,13 +547,28 @@ class DataToolset:
         - Enclose identifiers in double quotes if necessary (e.g., "column name").
         """
         
-        data = self.query_tool(sql_query)
-        data_df = pd.DataFrame(data)
+        import pandas as pd
+        from .simulation import METHODS, _forecast
 
-        data_df[date_column] = pd.to_datetime(data_df[date_column])
-        data_df = data_df.set_index(date_column)
-        
-        preds = _forecast(data_df[value_column], forecast_horizon, freq)
+        if method not in METHODS:
+            return {
+                'status': 'failure',
+                'error': f"Unknown forecast method '{method}', expected one of {METHODS}."
+            }
+
+        with span('tool.forecast', dataset=self.table_name, method=method, horizon=forecast_horizon) as s:
+            try:
+                data_df = await self._run_query(self._resolve, sql_query, tool_context)
+            except QueryError as e:
+                s.set(failure=e.reason)
+                return _failure(e)
+
+            data_df[date_column] = pd.to_datetime(data_df[date_column])
+            data_df = data_df.set_index(date_column)
+            s.set(n_obs=len(data_df))
+
+            # Fitting the model is CPU-bound, keep it off the event loop.
+            preds = await _run_in_process(_forecast, data_df[value_column], forecast_horizon, freq, method)
 
         forecasts = preds\
             .reset_index()\
@@ -237,3 +581,269 @@ class DataToolset:
             .to_dict('list')
         
         return forecasts
+
+    async def forecast_batch_tool(self, sql_query: str, group_by: list[str], value_column: str, date_column: str, forecast_horizon: int, freq: str, method: str, tool_context: ToolContext):
+        """
+        Forecasts many series at once, one per group, fitting them in parallel.
+        Series forecast with the same array engine are fitted together in one vectorised pass.
+
+        Use this instead of calling `forecast_tool` once per series, e.g. to forecast every
+        service line of every business unit in one call.
+
+        Parameters
+        ----------
+        sql_query : str
+            A result handle returned by `query_tool`, or a DuckDB-compatible SQL query used to
+            retrieve data. The result must hold one row per group and date.
+        group_by : list[str]
+            Columns identifying a series, e.g. ['business_unit', 'service_line'].
+        value_column : str
+            Column holding the values to forecast.
+        date_column : str
+            Column holding the dates of the values.
+        forecast_horizon : int
+            Number of future periods to forecast.
+        freq : str
+            Frequency of the data (e.g., 'M' for monthly, 'D' for daily).
+        method : str
+            Forecasting engine: 'prophet', 'ets' (exponential smoothing with damped trend),
+            'seasonal_naive', or 'auto' to let the tool pick. Use 'auto' unless asked otherwise.
+        tool_context : ToolContext
+            Context object holding the session state result handles are registered in.
+
+        Returns
+        -------
+        dict
+            The forecasts of all groups in long format, with the `group_by` columns, the date
+            column and the forecasted values, plus an `errors` entry listing groups that could
+            not be forecast.
+
+        Notes
+        -----
+        - Use DuckDB-compliant SQL syntax, especially for dates:
+            - Example: `WHERE date_column = DATE '2023-01-01'`
+        - String literals should use single quotes ('value').
+        - Enclose identifiers in double quotes if necessary (e.g., "column name").
+        """
+
+        import pandas as pd
+        from .simulation import METHODS, _choose_method, _forecast, _forecast_many
+
+        if method not in METHODS:
+            return {
+                'status': 'failure',
+                'error': f"Unknown forecast method '{method}', expected one of {METHODS}."
+            }
+
+        with span('tool.forecast_batch', dataset=self.table_name, method=method, horizon=forecast_horizon) as s:
+            try:
+                data_df = await self._run_query(self._resolve, sql_query, tool_context)
+            except QueryError as e:
+                s.set(failure=e.reason)
+                return _failure(e)
+            data_df[date_column] = pd.to_datetime(data_df[date_column])
+
+            keys, series = [], []
+            for key, group in data_df.groupby(group_by, sort=True):
+                keys.append(key)
+                series.append(group.set_index(date_column)[value_column].sort_index())
+
+            methods = [_choose_method(y, freq) if method == 'auto' else method for y in series]
+
+            # Prophet series are fitted in their own tasks, so they take about as
+            # long as the slowest fit given enough worker processes. Series for the
+            # array backends are forecast together in one vectorised task each.
+            tasks, slots = [], []
+            for m in dict.fromkeys(methods):
+                members = [i for i, mi in enumerate(methods) if mi == m]
+                if m == 'prophet':
+                    for i in members:
+                        tasks.append(_run_in_process(_forecast, series[i], forecast_horizon, freq, m))
+                        slots.append([i])
+                else:
+                    tasks.append(_run_in_process(_forecast_many, [series[i] for i in members], forecast_horizon, freq, m))
+                    slots.append(members)
+
+            outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+            s.set(n_series=len(series), n_obs=len(data_df), n_tasks=len(tasks))
+
+        results = [None] * len(series)
+        for members, outcome in zip(slots, outcomes):
+            if isinstance(outcome, Exception):
+                outcome = [outcome] * len(members)
+            elif not isinstance(outcome, list):
+                outcome = [outcome]
+            for i, preds in zip(members, outcome):
+                results[i] = preds
+
+        frames, errors = [], []
+        for key, preds in zip(keys, results):
+            if isinstance(preds, Exception):
+                errors.append({'group': list(key), 'error': str(preds)})
+                continue
+
+            frame = preds\
+                .reset_index()\
+                .rename(
+                    columns={
+                        'ds': date_column,
+                        'yhat': f'{value_column} (Forecasts)'
+                    }
+                )
+            for column, value in zip(group_by, key):
+                frame.insert(len(frame.columns) - 2, column, value)
+            frames.append(frame)
+
+        forecasts = pd.concat(frames, ignore_index=True).to_dict('list') if frames else {}
+        forecasts['errors'] = errors
+
+        return forecasts
+
+    def _backtest_data(self, levels: list[str], where: str, series: bool) -> tuple:
+        """
+        Run the backtest queries: the accuracy of the planned forecast of
+        every series of every grouping, and optionally the series themselves.
+
+        Returns
+        -------
+        tuple
+            The groupings, the columns they are grouped by, the accuracy table
+            and the series table (None unless asked for).
+        """
+        from .backtesting import _accuracy_query, _groupings, _series_query
+
+        config = ROLLUPS[self.table_name]
+        hierarchy = [r.level for r in self.engine.rollups() if r.dataset == self.table_name and r.level != 'total']
+        segments = config.get('segments', [])
+        groupings = _groupings(levels, hierarchy, segments)
+        columns = [c for c in segments + hierarchy if any(c in cols for _, cols in groupings)]
+
+        series_query = _series_query(
+            self.table_name, groupings, columns, config['date'], config['actual'], config['forecast'], where.replace('`', '')
+        )
+        _, accuracy = self._execute(_accuracy_query(series_query, columns))
+        table = None
+        if series:
+            _, table = self._execute(f"{series_query} ORDER BY ALL")
+        return groupings, columns, accuracy, table
+
+    async def backtest_tool(self, levels: list[str], where: str, method: str, cutoffs: int, horizon: int, freq: str, tool_context: ToolContext):
+        """
+        Measures forecast accuracy across the whole hierarchy in one pass, and backtests refitted models
+        against the planned forecast.
+
+        For every series of every grouping (e.g. every stream of every business unit), the planned
+        forecast is compared with the actuals: MAPE (mean absolute percentage error), WAPE (absolute
+        errors over absolute actuals) and bias (errors over actuals; positive means over-forecasting).
+        Groupings are aggregated first, so a stream's accuracy is that of the stream's totals.
+
+        With a method, every series is also refitted at `cutoffs` rolling origins, the last `horizon`
+        periods apart, and its forecasts of the next `horizon` periods scored against the actuals, next
+        to the planned forecast over the same periods, to tell whether a refit would have done better.
+
+        Parameters
+        ----------
+        levels : list[str]
+            Groupings to report, each 'total' or comma-separated columns, e.g. ['stream', 'business_unit,sub_stream'].
+            Lower hierarchy levels bring the levels above them along. Pass [] for every level, with and
+            without the business unit.
+        where : str
+            A SQL condition selecting the rows to evaluate, e.g. "year = 2024", or '' for all rows.
+        method : str
+            Forecasting engine to backtest: 'ets', 'seasonal_naive', 'prophet', 'auto', or 'none' to only
+            measure the planned forecast. 'ets' is fast enough for every series of the hierarchy.
+        cutoffs : int
+            Number of rolling origins to refit at, e.g. 3.
+        horizon : int
+            Number of periods forecast from each origin, e.g. 3.
+        freq : str
+            Frequency of the data (e.g., 'MS' for monthly, 'D' for daily).
+        tool_context : ToolContext
+            Context object holding the session state.
+
+        Returns
+        -------
+        dict
+            Per grouping, its number of series and its series with the largest WAPE first (up to a page
+            of them), each with `n` periods, `mape`, `wape` and `bias`, and with a method, a `backtest`
+            holding the `refit` and `planned` scores over the backtest windows.
+        """
+        import duckdb
+        import pandas as pd
+        from .backtesting import _grouping_ids, _rolling_origin
+        from .paging import _jsonable
+        from .simulation import METHODS
+
+        config = ROLLUPS.get(self.table_name)
+        if config is None:
+            return {'status': 'failure', 'error': f"{self.table_name} has no actual and forecast columns to backtest."}
+        if method != 'none' and method not in METHODS:
+            return {'status': 'failure', 'error': f"Unknown forecast method '{method}', expected 'none' or one of {METHODS}."}
+        refit = method != 'none' and cutoffs > 0 and horizon > 0
+
+        with span('tool.backtest', dataset=self.table_name, method=method, cutoffs=cutoffs, horizon=horizon) as s:
+            try:
+                groupings, columns, accuracy, table = await self._run_query(self._backtest_data, levels, where, refit)
+            except QueryError as e:
+                s.set(failure=e.reason)
+                return _failure(e)
+            except (ValueError, duckdb.Error) as e:
+                # Unknown levels, or a condition that isn't valid SQL.
+                return {'status': 'failure', 'error': str(e)}
+
+            def key(values) -> tuple:
+                return tuple(None if pd.isna(v) else v for v in values)
+
+            names = _grouping_ids(groupings, columns)
+            accuracy = accuracy.to_pandas()
+            accuracy['grouping'] = accuracy['grouping_id'].map(names)
+            keys = ['grouping'] + columns
+
+            scores = {}
+            if refit:
+                data = table.to_pandas()
+                data['date'] = pd.to_datetime(data['date'])
+                data['grouping'] = data['grouping_id'].map(names)
+                data = data.dropna(subset=['actual'])
+
+                ids, actuals, planned = [], [], []
+                for values, group in data.groupby(keys, sort=False, dropna=False):
+                    group = group.set_index('date').sort_index()
+                    ids.append(key(values))
+                    actuals.append(group['actual'])
+                    planned.append(group['forecast'])
+
+                # Series are split evenly over the worker processes; each
+                # worker refits its share through the vectorised backends.
+                n_chunks = max(1, min(executor.PROCESS_WORKERS, len(actuals)))
+                bounds = [round(len(actuals) * k / n_chunks) for k in range(n_chunks + 1)]
+                outcomes = await asyncio.gather(*(
+                    _run_in_process(_rolling_origin, actuals[lo:hi], planned[lo:hi], horizon, cutoffs, freq, method)
+                    for lo, hi in zip(bounds, bounds[1:]) if hi > lo
+                ), return_exceptions=True)
+
+                errors = [str(o) for o in outcomes if isinstance(o, Exception)]
+                if errors:
+                    return {'status': 'failure', 'error': f"Backtesting failed: {errors[0]}"}
+                results = [r for outcome in outcomes for r in outcome]
+                scores = dict(zip(ids, results))
+                s.set(n_series=len(actuals))
+
+        response = []
+        for name, cols in groupings:
+            rows = accuracy[accuracy['grouping'] == name].sort_values('wape', ascending=False, na_position='last')
+            series = []
+            for row in rows.head(self.page_rows).to_dict('records'):
+                entry = {c: _jsonable(row[c]) for c in cols}
+                entry.update({m: None if pd.isna(row[m]) else float(row[m]) for m in ('mape', 'wape', 'bias')})
+                entry['n'] = int(row['n'])
+                result = scores.get(key(row[k] for k in keys))
+                if result is not None:
+                    entry['backtest'] = result
+                series.append(entry)
+            response.append({'grouping': name, 'num_series': len(rows), 'series': series})
+
+        return {
+            'groupings': response,
+            'backtest': {'method': method, 'cutoffs': cutoffs, 'horizon': horizon} if refit else None,
+        }
@@ -0,0 +1,175 @@
+import numpy as np
+import pandas as pd
+
+from .instrumentation import span
+from .simulation import _choose_method, _forecast, _forecast_many
+from .storage import _quote
+
+# Rolling-origin refits need at least this many observations before a cutoff.
+MIN_TRAIN = 6
+
+
+def _groupings(levels: list[str], hierarchy: list[str], segments: list[str]) -> list[tuple]:
+    """
+    Resolve the groupings asked for into the columns each is grouped by.
+
+    A grouping is 'total' or a comma-separated list of segment and hierarchy
+    columns, e.g. 'business_unit,stream'; hierarchy levels bring the levels
+    above them along. No groupings means the total, every segment, every
+    hierarchy level and every segment by hierarchy level.
+
+    Returns
+    -------
+    list of tuple
+        The name and columns of every grouping, in the order asked for.
+    """
+    if not levels:
+        levels = ['total'] + segments + hierarchy + [f"{s},{h}" for s in segments for h in hierarchy]
+
+    groupings = []
+    for level in levels:
+        names = [c.strip() for c in level.split(',') if c.strip() and c.strip() != 'total']
+        unknown = [c for c in names if c not in hierarchy + segments]
+        if unknown:
+            raise ValueError(
+                f"Unknown level {', '.join(unknown)}; use 'total' or any of {', '.join(segments + hierarchy)}."
+            )
+        depth = max((hierarchy.index(c) + 1 for c in names if c in hierarchy), default=0)
+        columns = [s for s in segments if s in names] + hierarchy[:depth]
+        name = ','.join(columns) or 'total'
+        if name not in (g[0] for g in groupings):
+            groupings.append((name, columns))
+    return groupings
+
+
+def _series_query(dataset: str, groupings: list[tuple], columns: list[str], date: str, actual: str, forecast: str, where: str) -> str:
+    """
+    One query aggregating the actual and forecast values of every series of
+    every grouping per date, over the rows that have both, with `grouping_id`
+    telling the groupings apart (see `_grouping_ids`).
+    """
+    a, f, d = _quote(actual), _quote(forecast), _quote(date)
+    both = f"{a} IS NOT NULL AND {f} IS NOT NULL"
+    sets = ', '.join('(' + ', '.join([d] + [_quote(c) for c in cols]) + ')' for _, cols in groupings)
+    keys = ', '.join(_quote(c) for c in columns)
+    return f"""
+        SELECT {f'GROUPING({keys})' if columns else '0'} AS grouping_id, {keys + ', ' if columns else ''}{d} AS date,
+            sum({a}) FILTER (WHERE {both}) AS actual,
+            sum({f}) FILTER (WHERE {both}) AS forecast
+        FROM {_quote(dataset)}
+        {f'WHERE ({where})' if where.strip() else ''}
+        GROUP BY GROUPING SETS ({sets})
+    """
+
+
+def _accuracy_query(series_query: str, columns: list[str]) -> str:
+    """
+    Accuracy of the planned forecast of every series: MAPE over the dates
+    with a non-zero actual, WAPE (absolute errors over absolute actuals) and
+    bias (errors over actuals, positive for over-forecasting).
+    """
+    keys = ''.join(f"{_quote(c)}, " for c in columns)
+    return f"""
+        WITH series AS ({series_query})
+        SELECT grouping_id, {keys}
+            count(*) AS n,
+            avg(abs(forecast - actual) / abs(actual)) FILTER (WHERE actual <> 0) AS mape,
+            sum(abs(forecast - actual)) / nullif(sum(abs(actual)), 0) AS wape,
+            sum(forecast - actual) / nullif(sum(actual), 0) AS bias
+        FROM series
+        WHERE actual IS NOT NULL
+        GROUP BY ALL
+    """
+
+
+def _grouping_ids(groupings: list[tuple], columns: list[str]) -> dict:
+    """
+    The `GROUPING()` value of every grouping: a bit per column, most
+    significant first, set when the grouping doesn't group by it.
+    """
+    ids = {}
+    for name, cols in groupings:
+        ids[sum(1 << (len(columns) - 1 - i) for i, c in enumerate(columns) if c not in cols)] = name
+    return ids
+
+
+def _errors(actual: np.ndarray, forecast: np.ndarray) -> dict:
+    """
+    Error sums of forecasts against actuals that add up across windows.
+    """
+    error = forecast - actual
+    nonzero = actual != 0
+    return {
+        'n': actual.size,
+        'ape': float(np.sum(np.abs(error[nonzero] / actual[nonzero]))),
+        'n_ape': int(nonzero.sum()),
+        'abs_error': float(np.sum(np.abs(error))),
+        'abs_actual': float(np.sum(np.abs(actual))),
+        'error': float(np.sum(error)),
+        'actual': float(np.sum(actual)),
+    }
+
+
+def _scores(sums: dict) -> dict:
+    def ratio(a, b):
+        return a / b if b else None
+
+    return {
+        'mape': ratio(sums['ape'], sums['n_ape']),
+        'wape': ratio(sums['abs_error'], sums['abs_actual']),
+        'bias': ratio(sums['error'], sums['actual']),
+    }
+
+
+def _rolling_origin(actuals: list[pd.Series], planned: list[pd.Series], horizon: int, cutoffs: int, freq: str, method: str) -> list[dict]:
+    """
+    Backtest refits of many series at once: at each of `cutoffs` origins, the
+    last spaced `horizon` periods apart, refit on the actuals before it and
+    forecast the next `horizon` periods. The refits of all series at a cutoff
+    go through the vectorised backends together.
+
+    This is CPU-bound and is meant to run in a worker process.
+
+    Returns
+    -------
+    list of dict
+        Per series, the number of windows and the MAPE, WAPE and bias of the
+        refits and of the planned forecast over the same windows.
+    """
+    methods = [_choose_method(y, freq) if method == 'auto' else method for y in actuals]
+    refit = [[] for _ in actuals]
+    plan = [[] for _ in actuals]
+
+    with span('backtest.refit', method=method, n_series=len(actuals), cutoffs=cutoffs, horizon=horizon):
+        for j in range(cutoffs):
+            # Series whose window at this cutoff has enough history, by backend.
+            batches = {}
+            for i, y in enumerate(actuals):
+                origin = len(y) - horizon * (cutoffs - j)
+                if origin >= MIN_TRAIN:
+                    batches.setdefault(methods[i], []).append((i, origin))
+
+            for m, members in batches.items():
+                trains = [actuals[i].iloc[:origin] for i, origin in members]
+                if m == 'prophet':
+                    preds = [_forecast(y, horizon, freq, m) for y in trains]
+                else:
+                    preds = _forecast_many(trains, horizon, freq, m)
+                for (i, origin), pred in zip(members, preds):
+                    test = actuals[i].iloc[origin:origin + horizon]
+                    refit[i].append(_errors(test.to_numpy(float), pred.to_numpy(float)[:len(test)]))
+                    plan[i].append(_errors(test.to_numpy(float), planned[i].reindex(test.index).to_numpy(float)))
+
+    results = []
+    for windows, planned_windows in zip(refit, plan):
+        if not windows:
+            results.append({'windows': 0})
+            continue
+        total = {k: sum(w[k] for w in windows) for k in windows[0]}
+        planned_total = {k: sum(w[k] for w in planned_windows) for k in planned_windows[0]}
+        results.append({
+            'windows': len(windows),
+            'refit': _scores(total),
+            'planned': _scores(planned_total),
+        })
+    return results
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+
+# Quoted strings and identifiers are kept verbatim; reserved keywords are
+# lower-cased and whitespace collapsed.
+_SQL_TOKENS = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|(\s+)|([^'\"\s]+)")
+
+# Reserved keywords can't be unquoted identifiers, so folding their case never
+# merges queries whose results differ. Identifiers aren't folded: the case of a
+# column alias is the case of the result column.
+_KEYWORDS = re.compile(
+    r"\b(select|from|where|group|by|having|order|limit|offset|as|and|or|not|in|is|null|"
+    r"distinct|all|on|join|inner|left|right|full|outer|cross|union|except|intersect|"
+    r"with|case|when|then|else|end|between|like|asc|desc|true|false|cast|qualify|window)\b",
+    re.IGNORECASE,
+)
+
+# Queries whose result depends on when or how often they run are never cached.
+_VOLATILE = re.compile(r"\b(current_date|current_time|current_timestamp|now|today|random|uuid|gen_random_uuid)\b", re.IGNORECASE)
+
+
+def _normalize_sql(sql_query: str) -> str:
+    """
+    Normalise a SQL query so that trivially different spellings share a cache key.
+
+    Backticks are stripped the same way `query_tool` does, whitespace is collapsed,
+    reserved keywords are lower-cased and a trailing `;` is dropped. Identifiers
+    and quoted literals are left untouched since their case shows in the result.
+    """
+    parts = []
+    for quoted, space, word in _SQL_TOKENS.findall(sql_query.replace('`', '')):
+        if quoted:
+            parts.append(quoted)
+        elif space:
+            parts.append(' ')
+        else:
+            parts.append(_KEYWORDS.sub(lambda m: m.group(0).lower(), word))
+    return ''.join(parts).strip().rstrip(';').strip()
+
+
+def _result_handle(sql_query: str, version: str) -> str:
+    """
+    Short, stable name for the result of a query on a given data version.
+    """
+    digest = hashlib.sha1(f"{version}\0{_normalize_sql(sql_query)}".encode('utf-8'))
+    return 'r_' + digest.hexdigest()[:8]
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache of query results stored as Arrow tables.
+
+    Entries are keyed by the normalised SQL together with the version of the data
+    source they were computed from, so a reload of the source naturally stops old
+    entries from being hit. The cache is bounded by the total `nbytes` of the
+    stored tables; the least recently used entries are evicted first and tables
+    larger than the whole budget are never stored.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Memory budget for all cached tables combined.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(sql_query: str, version: str) -> tuple | None:
+        """
+        Build the cache key for a query, or None if the query must not be cached.
+        """
+        normalized = _normalize_sql(sql_query)
+        if _VOLATILE.search(normalized):
+            return None
+        return (version, normalized)
+
+    def get(self, key: tuple | None) -> pa.Table | None:
+        if key is None:
+            return None
+
+        with self._lock:
+            table = self._entries.get(key)
+            if table is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return table
+
+    def put(self, key: tuple | None, table: pa.Table):
+        size = table.nbytes
+        if key is None or size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._entries[key] = table
+            self.nbytes += size
+
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'nbytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
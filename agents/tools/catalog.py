@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from typing import TYPE_CHECKING
+
+from .instrumentation import span
+from .rollups import Rollup, _build_rollups, _define_rollups, _rollup_query, _update_rollups
+from .schema import _build_schema, _read_schema, _write_schema
+from .storage import STORAGE_FORMAT, _arrow_path, _ingest, _locked, _map, _materialise, _quote, _read_manifest, _source_stats, _view_query
+
+if TYPE_CHECKING:
+    import duckdb
+
+
+class Catalog:
+    """
+    Process-wide DuckDB database holding every dataset under a database folder.
+
+    Each sub-directory of `root` with a `data.csv` is a dataset, exposed as a
+    view named after the directory, so new datasets are picked up just by
+    adding a directory. Datasets are stored as partitioned Parquet (see
+    `storage.py`), kept up to date with their source files on use, and the
+    views read the Parquet copy, so filters on partition columns skip whole
+    files and only the columns a query uses are read. Datasets with a hierarchy
+    also get rollup tables (see `rollups.py`), and every version is profiled
+    once for the agents' instructions (see `schema.py`). When rows are appended, only
+    the new rows are ingested and only the rollup rows they fall into are
+    recomputed. Refreshes replace the view in place; queries already running
+    keep reading the version they started with.
+
+    Several processes (e.g. server workers) can share a database folder: a
+    dataset is refreshed by one of them at a time, and the others take up the
+    version it wrote when they next use the dataset. With the 'arrow' storage
+    format, every process memory-maps the same Arrow copy of each version
+    instead of holding its own, so adding workers doesn't add copies of the
+    data (see `storage.STORAGE_FORMAT`).
+
+    Parameters
+    ----------
+    root : str
+        Path to the database folder, e.g. `agents/database`.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+        self._lock = threading.Lock()
+        self._con = None
+        self._stats = {}
+        self._manifests = {}
+        self._rollups = {}
+        self._schemas = {}
+        # Memory-mapped Arrow tables of the datasets and rollups by name,
+        # registered on every cursor as it is handed out in place of a view.
+        self._mapped = {}
+        self._settings = {}
+
+    def datasets(self) -> list[str]:
+        """
+        Names of all datasets currently present under the database folder.
+        """
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.isfile(os.path.join(self.root, name, 'data.csv'))
+        )
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _connection(self) -> duckdb.DuckDBPyConnection:
+        if self._con is None:
+            import duckdb
+
+            self._con = duckdb.connect(database=":memory:")
+            for setting, value in self._settings.items():
+                self._con.execute(f"SET {setting} = ?", [value])
+        return self._con
+
+    def configure(self, **settings):
+        """
+        Apply DuckDB settings (e.g. `memory_limit`, `threads`) to the database,
+        now or once it is created. Settings are database-wide, so they apply to
+        every toolset sharing the catalog. None values are ignored.
+        """
+        settings = {k: v for k, v in settings.items() if v is not None}
+        with self._lock:
+            self._settings.update(settings)
+            if self._con is not None:
+                for setting, value in settings.items():
+                    self._con.execute(f"SET {setting} = ?", [value])
+
+    def _cursor(self) -> duckdb.DuckDBPyConnection:
+        con = self._connection().cursor()
+        for view, mapped in self._mapped.items():
+            con.register(view, mapped)
+        return con
+
+    def _map_view(self, con: duckdb.DuckDBPyConnection, view: str, path: str):
+        """
+        Expose a memory-mapped Arrow file of a stored version under a view name.
+
+        Registrations are per connection, so the name is resolved to the
+        mapped table when a cursor is handed out: cursors handed out earlier
+        keep the version they were given, however many refreshes follow.
+        """
+        mapped = _map(path)
+        con.register(view, mapped)
+        self._mapped[view] = mapped
+
+    def _replace_view(self, con: duckdb.DuckDBPyConnection, name: str, manifest: dict):
+        query = _view_query(self.path(name), manifest)
+        if STORAGE_FORMAT == 'arrow':
+            path = _materialise(con, query, _arrow_path(self.path(name), manifest, name))
+            self._map_view(con, name, path)
+        else:
+            con.execute(f'CREATE OR REPLACE VIEW {_quote(name)} AS {query}')
+
+    def _replace_rollups(self, con: duckdb.DuckDBPyConnection, name: str, manifest: dict) -> list[Rollup]:
+        if STORAGE_FORMAT != 'arrow':
+            return _build_rollups(con, name, self.path(name))
+        rollups = _define_rollups(con, name, self.path(name))
+        for rollup in rollups:
+            query = f"{_rollup_query(rollup)} ORDER BY ALL"
+            path = _materialise(con, query, _arrow_path(self.path(name), manifest, rollup.table))
+            self._map_view(con, rollup.table, path)
+        return rollups
+
+    def _refresh(self, name: str):
+        stats = _source_stats(self.path(name))
+        if self._stats.get(name) == stats:
+            return
+
+        with span('catalog.refresh', dataset=name) as s, _locked(self.path(name)):
+            con = self._connection()
+            loaded = self._manifests.get(name)
+            # The stored version may be newer than the loaded one if another
+            # process refreshed the dataset; it is then taken up as it is, and
+            # with the 'arrow' format so are the files it wrote.
+            stored = _read_manifest(self.path(name))
+            manifest, staged = _ingest(con, name, self.path(name), stored)
+            try:
+                changed = loaded is None or manifest['version'] != loaded['version']
+                # Rollups are only updated in place in memory, from the loaded version.
+                incremental = (
+                    STORAGE_FORMAT != 'arrow' and staged is not None
+                    and loaded is not None and stored['version'] == loaded['version']
+                )
+                s.set(changed=changed, incremental=incremental)
+                if changed:
+                    self._replace_view(con, name, manifest)
+                    if incremental:
+                        _update_rollups(con, self._rollups[name], staged)
+                    else:
+                        self._rollups[name] = self._replace_rollups(con, name, manifest)
+            finally:
+                if staged is not None:
+                    con.execute(f'DROP TABLE IF EXISTS "{staged}"')
+        self._manifests[name] = manifest
+        self._stats[name] = stats
+
+    def checkout(self, names: list[str]) -> tuple[str, duckdb.DuckDBPyConnection]:
+        """
+        Make sure the given datasets are loaded and current, and return their
+        combined version together with a cursor on the database.
+
+        The version changes whenever any of the named datasets changes, so it
+        is suitable for keying anything derived from them.
+        """
+        with self._lock:
+            digest = hashlib.sha256()
+            for name in sorted(names):
+                self._refresh(name)
+                digest.update(f"{name}={self._manifests[name]['version']};".encode('utf-8'))
+            return digest.hexdigest(), self._cursor()
+
+    def manifest(self, name: str) -> dict:
+        """
+        The storage manifest of a loaded dataset (see `storage._ingest`).
+        """
+        with self._lock:
+            return self._manifests[name]
+
+    def schema(self, name: str) -> dict:
+        """
+        Column types and statistics of the current version of a loaded
+        dataset (see `schema._build_schema`), computed once per version and
+        kept with its Parquet copy.
+        """
+        with self._lock:
+            manifest = self._manifests[name]
+            schema = self._schemas.get(name)
+            if schema is None or schema['version'] != manifest['version']:
+                schema = _read_schema(self.path(name), manifest)
+                if schema is None:
+                    with span('catalog.schema', dataset=name), self._cursor() as con:
+                        schema = _build_schema(con, name, manifest)
+                    _write_schema(self.path(name), schema)
+                self._schemas[name] = schema
+            return schema
+
+    def mapped_rows(self) -> dict:
+        """
+        Row counts of the datasets and rollups read from memory-mapped Arrow
+        tables, by view name; empty unless the storage format is 'arrow'.
+        """
+        with self._lock:
+            return {view: mapped.num_rows for view, mapped in self._mapped.items()}
+
+    def rollups(self, names: list[str]) -> list[Rollup]:
+        """
+        Rollups of the given datasets that are loaded, coarsest first per dataset.
+        """
+        with self._lock:
+            return [r for name in names for r in self._rollups.get(name, [])]
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(root: str) -> Catalog:
+    """
+    Return the process-wide catalog for a database folder, creating it on first use.
+    """
+    root = os.path.abspath(root)
+    with _catalogs_lock:
+        if root not in _catalogs:
+            _catalogs[root] = Catalog(root)
+        return _catalogs[root]
@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import TYPE_CHECKING
+
+from .governance import QueryNotAllowed, ResultTooLarge, _watch
+from .rollups import Rollup, _parse, _route
+from .storage import _partition_scope, _partition_version
+
+# DuckDB and Arrow are only imported once data is first touched, to keep
+# importing the agents cheap.
+if TYPE_CHECKING:
+    import duckdb
+    import pyarrow as pa
+
+    from .catalog import Catalog
+
+
+def _unique_names(names: list[str]) -> list[str]:
+    """
+    Rename duplicate column names the way DuckDB does for subqueries
+    (`a`, `a_1`, `a_2`, ...), comparing them case-insensitively as DuckDB
+    does, so a result reads the same whether it is materialised or not.
+    """
+    seen, counts, unique = set(), {}, []
+    for name in names:
+        candidate = name
+        while candidate.lower() in seen:
+            counts[name.lower()] = counts.get(name.lower(), 0) + 1
+            candidate = f"{name}_{counts[name.lower()]}"
+        seen.add(candidate.lower())
+        unique.append(candidate)
+    return unique
+
+
+# Schema metadata key marking a result cut short at its row limit, so the
+# mark travels with the table through the caches.
+_TRUNCATED = b'truncated'
+
+
+def _is_truncated(table: pa.Table | None) -> bool:
+    """
+    Whether `_fetch_arrow` cut a result short at its row limit.
+    """
+    return table is not None and (table.schema.metadata or {}).get(_TRUNCATED) == b'true'
+
+
+def _fetch_arrow(con: duckdb.DuckDBPyConnection, sql_query: str, max_bytes: int | None = None, limit_rows: int | None = None, limit_bytes: int | None = None) -> pa.Table | None:
+    """
+    Execute a query and return the whole result as an Arrow table, with
+    duplicate column names (e.g. of a `SELECT *` join) made unique.
+
+    If `max_bytes` is given, the result is streamed batch by batch and None is
+    returned as soon as it grows past that size, so oversized results are never
+    fully materialised. Results are cut to their first `limit_rows` rows, and
+    reading stops there (see `_is_truncated`); results over `limit_bytes`
+    bytes raise `ResultTooLarge`.
+    """
+    import pyarrow as pa
+
+    def finish(table: pa.Table, truncated: bool) -> pa.Table:
+        table = table.rename_columns(_unique_names(table.column_names))
+        if truncated:
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}), _TRUNCATED: b'true'})
+        return table
+
+    def too_large(size: int) -> bool:
+        if limit_bytes is not None and size > limit_bytes:
+            raise ResultTooLarge(f"The query returns more than {limit_bytes:,} bytes of data.")
+        return max_bytes is not None and size > max_bytes
+
+    result = con.execute(sql_query).arrow()
+
+    # Older DuckDB releases return a table from `arrow()`, newer ones a record batch reader.
+    if isinstance(result, pa.Table):
+        truncated = limit_rows is not None and result.num_rows > limit_rows
+        if truncated:
+            result = result.slice(0, limit_rows)
+        if too_large(result.nbytes):
+            return None
+        return finish(result, truncated)
+
+    batches = []
+    rows = size = 0
+    truncated = False
+    for batch in result:
+        if limit_rows is not None and rows + batch.num_rows > limit_rows:
+            batch = batch.slice(0, limit_rows - rows)
+            truncated = True
+        rows += batch.num_rows
+        size += batch.nbytes
+        if too_large(size):
+            return None
+        batches.append(batch)
+        if truncated:
+            break
+    return finish(pa.Table.from_batches(batches, schema=result.schema), truncated)
+
+
+# Table functions queries may use. Any other (read_csv, read_parquet,
+# duckdb_tables, ...) could read files or tables outside the toolset's scope.
+ALLOWED_TABLE_FUNCTIONS = {'range', 'generate_series', 'unnest'}
+
+_parser = None
+
+
+def _syntax_tree(sql_query: str) -> dict:
+    """
+    DuckDB's JSON syntax tree of a query, raising `QueryNotAllowed` if it
+    can't be parsed.
+
+    The query is only parsed, not bound, so this runs on an empty database.
+    """
+    global _parser
+    if _parser is None:
+        import duckdb
+
+        _parser = duckdb.connect(database=":memory:")
+    try:
+        with _parser.cursor() as con:
+            tree = json.loads(con.execute("SELECT json_serialize_sql(?)", [sql_query]).fetchone()[0])
+    except Exception as e:
+        raise QueryNotAllowed(f"The query could not be parsed: {e}")
+    if tree.get('error'):
+        raise QueryNotAllowed(f"The query could not be parsed: {tree.get('error_message', 'unsupported query')}")
+    return tree
+
+
+def _references(sql_query: str) -> tuple[set, set]:
+    """
+    Names of the tables and views a query refers to, as written, and of the
+    table functions it calls. CTEs are left out, and names in other schemas
+    or databases are qualified.
+    """
+    names, functions, ctes = set(), set(), set()
+
+    def walk(node):
+        if isinstance(node, list):
+            for child in node:
+                walk(child)
+            return
+        if not isinstance(node, dict):
+            return
+        if node.get('type') == 'BASE_TABLE':
+            catalog, schema, table = node['catalog_name'], node['schema_name'], node['table_name']
+            if catalog in ('', 'memory') and schema in ('', 'main'):
+                names.add(table)
+            else:
+                names.add('.'.join(p for p in (catalog, schema, table) if p))
+        elif node.get('type') == 'TABLE_FUNCTION':
+            functions.add(node['function'].get('function_name', '').lower())
+        for entry in (node.get('cte_map') or {}).get('map', []):
+            ctes.add(entry['key'])
+        for value in node.values():
+            if isinstance(value, (dict, list)):
+                walk(value)
+
+    walk(_syntax_tree(sql_query)['statements'])
+    return names - ctes, functions
+
+
+def _table_names(sql_query: str) -> set:
+    return _references(sql_query)[0]
+
+
+class DataEngine:
+    """
+    A toolset's scoped view of the shared catalog.
+
+    Queries run against the process-wide database of the catalog, so every
+    dataset is loaded once per process and datasets in scope can be joined.
+    Only read-only queries over the datasets in scope and their rollups are
+    allowed, and aggregate queries a rollup can answer are routed to it.
+
+    Parameters
+    ----------
+    catalog : Catalog
+        The shared catalog holding the datasets.
+    table_name : str
+        Name of the toolset's own dataset.
+    scope : list[str] | None
+        Datasets the toolset may query. Defaults to every dataset in the catalog,
+        including ones added later.
+    """
+
+    def __init__(self, catalog: Catalog, table_name: str, scope: list[str] | None = None):
+        self.catalog = catalog
+        self.table_name = table_name
+        self.scope = scope
+        self.version = None
+
+    def datasets(self) -> list[str]:
+        datasets = self.catalog.datasets() if self.scope is None else list(self.scope)
+        if self.table_name not in datasets:
+            datasets.append(self.table_name)
+        return datasets
+
+    def rollups(self) -> list[Rollup]:
+        """
+        Rollups of the datasets in scope, loading the datasets if needed.
+        """
+        with self.checkout()[1]:
+            return self.catalog.rollups(self.datasets())
+
+    def tables(self) -> list[str]:
+        """
+        Every table queries may read: the datasets in scope and their rollups.
+        """
+        return self.datasets() + [r.table for r in self.catalog.rollups(self.datasets())]
+
+    def checkout(self) -> tuple[str, duckdb.DuckDBPyConnection]:
+        """
+        Return the current data version together with a cursor reading it.
+
+        The version is derived from content hashes of the datasets in scope,
+        suitable for keying anything derived from the data.
+        """
+        self.version, con = self.catalog.checkout(self.datasets())
+        return self.version, _watch(con)
+
+    def cursor(self) -> duckdb.DuckDBPyConnection:
+        """
+        Return a cursor on the current version of the datasets in scope.
+
+        Cursors are cheap and must not be shared between threads; use one per
+        call, ideally as a context manager so it is closed afterwards.
+        """
+        return self.checkout()[1]
+
+    def validate(self, con: duckdb.DuckDBPyConnection, sql_query: str):
+        """
+        Raise `QueryNotAllowed` unless `sql_query` is a single read-only query
+        over tables in scope.
+        """
+        import duckdb
+
+        try:
+            statements = con.extract_statements(sql_query)
+        except duckdb.Error as e:
+            raise QueryNotAllowed(f"The query could not be parsed: {e}")
+        if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+            raise QueryNotAllowed("Only a single SELECT query can be run.")
+
+        names, functions = _references(sql_query)
+        functions -= ALLOWED_TABLE_FUNCTIONS
+        if functions:
+            raise QueryNotAllowed(
+                f"Table function(s) {', '.join(sorted(functions))} can't be used; query the tables in scope instead."
+            )
+        outside = names - set(self.tables())
+        if outside:
+            raise QueryNotAllowed(
+                f"Unknown table(s) {', '.join(sorted(outside))}; available tables are {', '.join(self.tables())}."
+            )
+
+    def version_of(self, con: duckdb.DuckDBPyConnection, sql_query: str) -> str:
+        """
+        Version of the data `sql_query` reads, for keying its results.
+
+        Only the datasets the query refers to (directly or through their
+        rollups) count, and for a query over a single dataset only the
+        partitions its WHERE clause doesn't rule out, so appending rows to
+        some partitions leaves cached results over the others valid.
+        """
+        owners = {r.table: r.dataset for r in self.catalog.rollups(self.datasets())}
+        names = sorted({owners.get(t, t) for t in _table_names(sql_query)})
+
+        scope = {}
+        tree = _parse(con, sql_query) if len(names) == 1 else None
+        if tree is not None:
+            node = tree['statements'][0]['node']
+            scope = _partition_scope(node, self.catalog.manifest(names[0])['partition_by'])
+
+        digest = hashlib.sha256()
+        for name in names:
+            digest.update(f"{name}={_partition_version(self.catalog.manifest(name), scope)};".encode('utf-8'))
+        return digest.hexdigest()
+
+    def arrow_rows(self, sql_query: str) -> int | None:
+        """
+        Rows of the largest memory-mapped table a query reads, to stand in
+        for DuckDB's estimate of its Arrow scans, which the plan doesn't tie
+        to a table; None if it reads none.
+        """
+        counts = self.catalog.mapped_rows()
+        return max((counts[t] for t in _table_names(sql_query) if t in counts), default=None)
+
+    def route(self, con: duckdb.DuckDBPyConnection, sql_query: str) -> str:
+        """
+        Return `sql_query` rewritten to read a rollup if one can answer it,
+        otherwise unchanged.
+        """
+        return _route(con, sql_query, self.catalog.rollups(self.datasets())) or sql_query
@@ -0,0 +1,101 @@
+import asyncio
+import contextvars
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .instrumentation import _call_with_parent, _remote_parent
+
+
+# Pool sizes can be set from the environment; a process pool size of 0 runs
+# CPU-bound work on the thread pool instead.
+THREAD_WORKERS = int(os.environ.get('AI_ANALYST_THREAD_WORKERS', min(32, (os.cpu_count() or 1) + 4)))
+PROCESS_WORKERS = int(os.environ.get('AI_ANALYST_PROCESS_WORKERS', os.cpu_count() or 1))
+
+_lock = threading.Lock()
+_thread_pool = None
+_process_pool = None
+
+
+def configure_executors(thread_workers: int | None = None, process_workers: int | None = None):
+    """
+    Resize the shared pools. Pools already running are shut down once their
+    current work is done and recreated lazily with the new sizes.
+    """
+    global THREAD_WORKERS, PROCESS_WORKERS, _thread_pool, _process_pool
+
+    with _lock:
+        if thread_workers is not None:
+            THREAD_WORKERS = thread_workers
+            if _thread_pool is not None:
+                _thread_pool.shutdown(wait=False)
+            _thread_pool = None
+        if process_workers is not None:
+            PROCESS_WORKERS = process_workers
+            if _process_pool is not None:
+                _process_pool.shutdown(wait=False)
+            _process_pool = None
+
+
+def _threads() -> ThreadPoolExecutor:
+    global _thread_pool
+    with _lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=THREAD_WORKERS, thread_name_prefix='ai-analyst')
+        return _thread_pool
+
+
+def _processes() -> ProcessPoolExecutor:
+    global _process_pool
+    with _lock:
+        if _process_pool is None:
+            # Forking a process that runs DuckDB and asyncio threads is unsafe,
+            # so workers are always started fresh.
+            _process_pool = ProcessPoolExecutor(
+                max_workers=PROCESS_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _process_pool
+
+
+def _reset_processes(pool: ProcessPoolExecutor):
+    global _process_pool
+    with _lock:
+        if _process_pool is pool:
+            _process_pool = None
+    pool.shutdown(wait=False)
+
+
+async def _run_in_thread(fn, *args, **kwargs):
+    """
+    Run blocking I/O-bound work, such as a DuckDB query, on the shared thread pool.
+    The work runs in a copy of the caller's context, so it sees the caller's
+    current span and query deadline.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_threads(), lambda: context.run(fn, *args, **kwargs))
+
+
+async def _run_in_process(fn, *args, **kwargs):
+    """
+    Run CPU-bound work, such as fitting a model or rendering a figure, on the
+    shared process pool. `fn` and its arguments must be picklable.
+    """
+    if PROCESS_WORKERS <= 0:
+        return await _run_in_thread(fn, *args, **kwargs)
+
+    loop = asyncio.get_running_loop()
+    pool = _processes()
+    # Spans in the worker are nested under the caller's current span.
+    parent = _remote_parent()
+    try:
+        future = pool.submit(_call_with_parent, parent, fn, *args, **kwargs)
+    except BrokenProcessPool:
+        # A worker died earlier (e.g. killed for using too much memory);
+        # start a new pool rather than failing every call from now on.
+        _reset_processes(pool)
+        future = _processes().submit(_call_with_parent, parent, fn, *args, **kwargs)
+    return await asyncio.wrap_future(future, loop=loop)
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import contextvars
+import json
+import re
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from .instrumentation import current_span
+
+if TYPE_CHECKING:
+    import duckdb
+
+
+@dataclass(frozen=True)
+class QueryPolicy:
+    """
+    Limits every query run by a toolset is held to.
+    Args:
+        timeout (float): Wall-clock seconds a tool call may spend in DuckDB before
+            its queries are interrupted; 0 disables the timeout.
+        memory_limit (str): DuckDB `memory_limit`, e.g. '2GB'; larger intermediates
+            spill to disk or fail. Database-wide, so it applies to every toolset
+            sharing the catalog (the last one set wins).
+        threads (int): DuckDB `threads`, also database-wide; None keeps DuckDB's default.
+        max_rows (int): Results are cut to this many rows, and marked as truncated.
+        max_bytes (int): Queries returning more data (in Arrow) are rejected.
+        max_cost (float): Queries whose plan is estimated to produce more rows in
+            total, summed over all operators, are rejected before they run.
+    """
+    timeout: float = 30.0
+    memory_limit: str | None = '2GB'
+    threads: int | None = None
+    max_rows: int = 1_000_000
+    max_bytes: int = 512 * 1024 * 1024
+    max_cost: float = 1e9
+
+
+class QueryError(ValueError):
+    """
+    A query the toolset refused to run or stopped. `reason` is a short code
+    and `hint` tells the agent what to do instead.
+    """
+    reason = 'query_error'
+    hint = 'Fix the query and try again.'
+
+    def __init__(self, message: str, hint: str | None = None):
+        super().__init__(message)
+        if hint is not None:
+            self.hint = hint
+
+
+class QueryNotAllowed(QueryError):
+    """
+    Raised for SQL a toolset refuses to run, e.g. statements other than queries
+    or queries touching tables outside its scope.
+    """
+    reason = 'not_allowed'
+    hint = 'Only run a single SELECT query over the tables listed in your instructions.'
+
+
+class QueryTimeout(QueryError):
+    reason = 'timeout'
+    hint = 'Filter to fewer rows, aggregate earlier, avoid cross joins, or query a rollup table.'
+
+
+class QueryTooCostly(QueryError):
+    reason = 'too_costly'
+    hint = 'Add join conditions and filters so fewer rows are combined, or aggregate before joining.'
+
+
+class ResultTooLarge(QueryError):
+    reason = 'too_large'
+    hint = 'Aggregate the data, select fewer columns or add a LIMIT.'
+
+
+class QueryOutOfMemory(QueryError):
+    reason = 'out_of_memory'
+    hint = 'Aggregate earlier, avoid cross joins and select fewer columns.'
+
+
+def _failure(error: QueryError) -> dict:
+    return {
+        'status': 'failure',
+        'reason': error.reason,
+        'error': str(error),
+        'hint': error.hint,
+    }
+
+
+class _Deadline:
+    """
+    Interrupts every DuckDB cursor watched on its behalf once it expires.
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expired = False
+        self._lock = threading.Lock()
+        self._cursors = []
+        self._timer = threading.Timer(seconds, self._expire) if seconds and seconds > 0 else None
+        if self._timer is not None:
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _expire(self):
+        with self._lock:
+            self.expired = True
+            cursors, self._cursors = self._cursors, []
+        for con in cursors:
+            try:
+                con.interrupt()
+            except Exception:
+                # Already closed.
+                pass
+
+    def watch(self, con: duckdb.DuckDBPyConnection):
+        with self._lock:
+            if self.expired:
+                raise QueryTimeout(f"The query took longer than {self.seconds:g}s and was stopped.")
+            self._cursors.append(con)
+
+    def cancel(self):
+        if self._timer is not None:
+            self._timer.cancel()
+
+
+_deadline = contextvars.ContextVar('deadline', default=None)
+
+
+def _watch(con: duckdb.DuckDBPyConnection) -> duckdb.DuckDBPyConnection:
+    """
+    Put a cursor under the deadline of the running tool call, if any.
+    """
+    deadline = _deadline.get()
+    if deadline is not None:
+        deadline.watch(con)
+    return con
+
+
+def _governed(timeout: float, fn, *args, **kwargs):
+    """
+    Run `fn`, interrupting the DuckDB queries it runs once `timeout` seconds
+    have passed, and turning DuckDB interruptions and out-of-memory errors
+    into `QueryError`s.
+
+    Meant to be called in the worker thread the queries run on, so the
+    deadline is seen by every cursor `fn` opens.
+    """
+    import duckdb
+
+    deadline = _Deadline(timeout)
+    token = _deadline.set(deadline)
+    try:
+        return fn(*args, **kwargs)
+    except QueryError:
+        raise
+    except duckdb.OutOfMemoryException as e:
+        raise QueryOutOfMemory(f"The query ran out of memory: {e}") from None
+    except Exception:
+        # Interruptions surface as DuckDB or, mid-stream, Arrow errors.
+        if deadline.expired:
+            raise QueryTimeout(f"The query took longer than {timeout:g}s and was stopped.") from None
+        raise
+    finally:
+        deadline.cancel()
+        _deadline.reset(token)
+
+
+# Operators that combine every row of one input with every row of the other
+# when DuckDB has no estimate for them.
+_PRODUCT_OPERATORS = {'CROSS_PRODUCT', 'NESTED_LOOP_JOIN', 'BLOCKWISE_NL_JOIN', 'PIECEWISE_MERGE_JOIN'}
+
+
+def _estimate_cost(con: duckdb.DuckDBPyConnection, sql_query: str, arrow_rows: float | None = None) -> float:
+    """
+    Estimate the work a query takes as the number of rows produced by all
+    operators of its plan, from DuckDB's cardinality estimates.
+
+    DuckDB estimates scans of Arrow tables (the memory-mapped datasets of the
+    'arrow' storage format) at one row, and the operators above them from
+    that; `arrow_rows` is used for those scans instead, and above them every
+    operator is taken to produce at least as many rows as its largest input.
+
+    The estimated number of rows scanned, by the plan's leaves, is recorded
+    on the current span.
+    """
+    plan = json.loads(con.execute(f"EXPLAIN (FORMAT JSON) {sql_query}").fetchall()[0][1])
+    total = scanned = 0.0
+
+    def rows(node: dict) -> tuple[float, bool]:
+        nonlocal total, scanned
+        results = [rows(child) for child in node.get('children', [])]
+        children = [n for n, _ in results]
+        arrow = node.get('name') == 'ARROW_SCAN' and arrow_rows is not None
+        underestimated = arrow or any(u for _, u in results)
+        estimate = re.sub(r'[^0-9.]', '', str(node.get('extra_info', {}).get('Estimated Cardinality', '')))
+        if arrow:
+            out = float(arrow_rows)
+        elif node.get('name') in _PRODUCT_OPERATORS and children and (underestimated or not estimate):
+            out = 1.0
+            for n in children:
+                out *= max(n, 1.0)
+        elif estimate:
+            out = float(estimate)
+            if underestimated:
+                out = max([out] + children)
+        else:
+            out = max(children, default=0.0)
+        total += out
+        if not children:
+            scanned += out
+        return out, underestimated
+
+    for node in plan:
+        rows(node)
+    current_span().set(rows_scanned_estimate=scanned, cost_estimate=total)
+    return total
@@ -0,0 +1,278 @@
+import atexit
+import contextvars
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Hot paths of the tools are timed as named spans, nested per tool call across
+# the thread and process pools, with the counts the code records on them (rows,
+# bytes, cache hits). `AI_ANALYST_METRICS` turns them on and chooses the sink:
+# a path ending in `.prom` gets Prometheus text-format metrics aggregated per
+# span, for node_exporter's textfile collector (worker processes write their own
+# file, with their pid in the name); any other path gets one JSON line per span.
+# Spans named in `AI_ANALYST_PROFILE` (comma-separated, or `*`) are also run
+# under cProfile for a fraction `AI_ANALYST_PROFILE_RATE` of calls, and the
+# stats written to `AI_ANALYST_PROFILE_DIR`. Spans record their pid and thread
+# name, so py-spy samples can be lined up with them.
+METRICS_PATH = os.environ.get('AI_ANALYST_METRICS') or None
+PROFILE_SPANS = {s.strip() for s in os.environ.get('AI_ANALYST_PROFILE', '').split(',') if s.strip()}
+PROFILE_RATE = float(os.environ.get('AI_ANALYST_PROFILE_RATE', 1.0))
+PROFILE_DIR = os.environ.get('AI_ANALYST_PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'ai-analyst-profiles')
+
+# Upper bounds, in seconds, of the Prometheus duration histogram buckets.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Span:
+    """
+    A timed piece of work. Labels are attached with `set` and counts with `add`.
+    """
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'attrs')
+
+    def __init__(self, name: str, trace_id: str, span_id: str, parent_id: str | None, attrs: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add(self, **counts):
+        for key, value in counts.items():
+            self.attrs[key] = self.attrs.get(key, 0) + value
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def add(self, **counts):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+_current = contextvars.ContextVar('span', default=None)
+_ids = itertools.count(1)
+
+
+def _new_id() -> str:
+    return f"{os.getpid():x}-{next(_ids):x}"
+
+
+class _JsonlSink:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, record: dict):
+        line = json.dumps(record, default=str) + '\n'
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+
+class _PrometheusSink:
+    """
+    Aggregates spans into counters and a duration histogram per span name,
+    and rewrites the metrics file at most once per `interval` seconds (and
+    at exit).
+    """
+
+    def __init__(self, path: str, interval: float = 1.0):
+        self.path = path
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._written = 0.0
+        self._durations = {}
+        self._counters = {}
+        atexit.register(self.flush)
+
+    def emit(self, record: dict):
+        with self._lock:
+            key = (record['name'], record['status'])
+            count, total, buckets = self._durations.get(key, (0, 0.0, [0] * len(DURATION_BUCKETS)))
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if record['duration_s'] <= bound:
+                    buckets[i] += 1
+            self._durations[key] = (count + 1, total + record['duration_s'], buckets)
+
+            for attr, value in record.get('attrs', {}).items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if isinstance(value, (int, float)):
+                    counter = (record['name'], attr)
+                    self._counters[counter] = self._counters.get(counter, 0) + value
+
+            due = time.monotonic() - self._written >= self.interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            self._written = time.monotonic()
+            lines = [
+                '# HELP ai_analyst_span_duration_seconds Duration of instrumented work.',
+                '# TYPE ai_analyst_span_duration_seconds histogram',
+            ]
+            for (name, status), (count, total, buckets) in sorted(self._durations.items()):
+                labels = f'span="{name}",status="{status}"'
+                for bound, n in zip(DURATION_BUCKETS, buckets):
+                    lines.append(f'ai_analyst_span_duration_seconds_bucket{{{labels},le="{bound}"}} {n}')
+                lines.append(f'ai_analyst_span_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f'ai_analyst_span_duration_seconds_sum{{{labels}}} {total}')
+                lines.append(f'ai_analyst_span_duration_seconds_count{{{labels}}} {count}')
+
+            lines += [
+                '# HELP ai_analyst_span_total Sum of counts recorded on spans (rows, bytes, cache hits, ...).',
+                '# TYPE ai_analyst_span_total counter',
+            ]
+            for (name, attr), value in sorted(self._counters.items()):
+                lines.append(f'ai_analyst_span_total{{span="{name}",count="{attr}"}} {value}')
+
+            tmp = f"{self.path}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+            os.replace(tmp, self.path)
+
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def _get_sink():
+    global _sink
+    if METRICS_PATH is None:
+        return None
+    with _sink_lock:
+        if _sink is None:
+            if METRICS_PATH.endswith('.prom'):
+                path = METRICS_PATH
+                if multiprocessing.parent_process() is not None:
+                    path = f"{path[:-len('.prom')]}.{os.getpid()}.prom"
+                _sink = _PrometheusSink(path)
+            else:
+                _sink = _JsonlSink(METRICS_PATH)
+        return _sink
+
+
+_profiling = threading.local()
+
+
+@contextmanager
+def _profiled(name: str):
+    """
+    Run the body under cProfile if the span is selected for profiling, and
+    no profile is already running on this thread.
+    """
+    selected = ('*' in PROFILE_SPANS or name in PROFILE_SPANS) and random.random() < PROFILE_RATE
+    if not selected or getattr(_profiling, 'active', False):
+        yield
+        return
+
+    import cProfile
+
+    profile = cProfile.Profile()
+    _profiling.active = True
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        _profiling.active = False
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profile.dump_stats(os.path.join(PROFILE_DIR, f"{name}-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{_new_id()}.prof"))
+
+
+def enabled() -> bool:
+    return METRICS_PATH is not None or bool(PROFILE_SPANS)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Time the body as a span called `name`, nested under the current span.
+
+    Yields the span, so the body can record counts on it with `set`/`add`.
+    Exceptions are recorded (status 'error' and the exception type) and
+    re-raised.
+    """
+    if not enabled():
+        yield _NO_SPAN
+        return
+
+    parent = _current.get()
+    current = Span(
+        name,
+        parent.trace_id if parent is not None else _new_id(),
+        _new_id(),
+        parent.span_id if parent is not None else None,
+        dict(attrs),
+    )
+    token = _current.set(current)
+    start, wall = time.perf_counter(), time.time()
+    status = 'ok'
+    try:
+        with _profiled(name):
+            yield current
+    except BaseException as e:
+        status = 'error'
+        current.attrs['error'] = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        sink = _get_sink()
+        if sink is not None:
+            sink.emit({
+                'name': name,
+                'trace_id': current.trace_id,
+                'span_id': current.span_id,
+                'parent_id': current.parent_id,
+                'start': wall,
+                'duration_s': time.perf_counter() - start,
+                'status': status,
+                'pid': os.getpid(),
+                'thread': threading.current_thread().name,
+                'attrs': current.attrs,
+            })
+
+
+def current_span() -> Span | _NoSpan:
+    """
+    The innermost running span, to record counts on from nested code.
+    """
+    return _current.get() or _NO_SPAN
+
+
+def _remote_parent() -> tuple | None:
+    """
+    What a worker process needs to nest its spans under the current one.
+    """
+    current = _current.get()
+    if current is None or not enabled():
+        return None
+    return current.trace_id, current.span_id
+
+
+def _call_with_parent(parent: tuple | None, fn, *args, **kwargs):
+    """
+    Run `fn` in a worker process with its spans nested under `parent`.
+    """
+    if parent is None:
+        return fn(*args, **kwargs)
+    token = _current.set(Span('remote', parent[0], parent[1], None, {}))
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _current.reset(token)
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from .engine import _fetch_arrow
+from .storage import _quote
+
+if TYPE_CHECKING:
+    import duckdb
+    import pyarrow as pa
+
+
+def _jsonable(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def _source(con: duckdb.DuckDBPyConnection, sql_query: str, table: pa.Table | None) -> str:
+    """
+    Return something that can go in a FROM clause for a query result.
+
+    Materialised results are scanned in place from Arrow; otherwise the query is
+    inlined as a subquery so DuckDB can stream over it.
+    """
+    if table is not None:
+        con.register('_result', table)
+        return '_result'
+    return f"({sql_query.strip().rstrip(';')}) AS _result"
+
+
+def _summarize(con: duckdb.DuckDBPyConnection, sql_query: str, table: pa.Table | None) -> tuple[int, dict]:
+    """
+    Compute the row count and a per-column summary of a query result in DuckDB.
+
+    Distinct counts are approximate, as in `schema._build_schema`, so that
+    summarising a result too large to materialise takes memory independent of
+    the cardinality of its columns.
+
+    Returns
+    -------
+    tuple
+        The number of rows and a dictionary mapping every column to its non-null
+        count, min, max and approximate distinct count.
+    """
+    source = _source(con, sql_query, table)
+    columns = [d[0] for d in con.execute(f"SELECT * FROM {source} LIMIT 0").description]
+
+    aggregates = ['count(*)']
+    for c in columns:
+        q = _quote(c)
+        aggregates += [f'count({q})', f'min({q})', f'max({q})', f'approx_count_distinct({q})']
+
+    values = con.execute(f"SELECT {', '.join(aggregates)} FROM {source}").fetchone()
+
+    summary = {}
+    for i, c in enumerate(columns):
+        count, lo, hi, distinct = values[1 + 4 * i: 5 + 4 * i]
+        summary[c] = {
+            'count': count,
+            'min': _jsonable(lo),
+            'max': _jsonable(hi),
+            'distinct': distinct,
+        }
+    return values[0], summary
+
+
+def _page(con: duckdb.DuckDBPyConnection, sql_query: str, table: pa.Table | None, offset: int, max_rows: int, max_bytes: int) -> pa.Table:
+    """
+    Fetch one page of a query result, capped both by row count and by Arrow size.
+
+    At least one row is always returned if there is one, so paging makes progress
+    even when a single row is over the byte budget.
+    """
+    if table is not None:
+        page = table.slice(offset, max_rows)
+    else:
+        page = _fetch_arrow(con, f"SELECT * FROM {_source(con, sql_query, None)} LIMIT {max_rows} OFFSET {offset}")
+
+    if page.num_rows and page.nbytes > max_bytes:
+        row_bytes = page.nbytes / page.num_rows
+        page = page.slice(0, max(1, int(max_bytes // row_bytes)))
+    return page
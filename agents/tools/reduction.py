@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .storage import _quote
+
+if TYPE_CHECKING:
+    import duckdb
+    import pandas as pd
+
+
+# Distribution plots are pre-binned into this many bins per group; seaborn then
+# re-bins the (weighted) bin centres, which is indistinguishable at plot scale.
+DISTRIBUTION_BINS = 512
+
+# Seaborn categorical plots that show a per-category estimate and can be drawn
+# from an aggregate, and those that need (a sample of) the raw values.
+_ESTIMATE_KINDS = ('bar', 'point')
+_SAMPLE_KINDS = ('strip', 'swarm', 'box', 'violin', 'boxen')
+
+_NUMERIC_TYPES = {
+    'TINYINT', 'SMALLINT', 'INTEGER', 'BIGINT', 'HUGEINT',
+    'UTINYINT', 'USMALLINT', 'UINTEGER', 'UBIGINT', 'UHUGEINT',
+    'FLOAT', 'DOUBLE', 'DECIMAL',
+}
+
+
+def _columns(df_columns, *columns) -> list[str]:
+    """
+    The given column names that are set and exist, in order and without duplicates.
+    """
+    return list(dict.fromkeys(c for c in columns if c and c in df_columns))
+
+
+def _numeric_axis(values: pd.Series) -> np.ndarray:
+    """
+    Values of an x axis as floats: datetimes become nanoseconds, anything that
+    is not numeric falls back to its position.
+    """
+    import pandas as pd
+
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy().astype('datetime64[ns]').astype(np.int64).astype(float)
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=float)
+    return np.arange(len(values), dtype=float)
+
+
+def _lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Keeps the first and last point and, from every bucket in between, the point
+    forming the largest triangle with the previously kept point and the mean of
+    the next bucket, which preserves peaks and troughs of the line.
+
+    Returns
+    -------
+    np.ndarray
+        Sorted indices of the points to keep.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    kept = np.empty(n_out, dtype=int)
+    kept[0], kept[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        nxt_start, nxt_stop = stop, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nxt_start:nxt_stop].mean()
+        avg_y = y[nxt_start:nxt_stop].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:stop] - y[a])
+            - (x[a] - x[start:stop]) * (avg_y - y[a])
+        )
+        a = start + int(np.nanargmax(area)) if np.isfinite(area).any() else start
+        kept[i + 1] = a
+    return kept
+
+
+def _reduce_relation(df: pd.DataFrame, x: str, y: str, kind: str, groups: list[str], max_points: int) -> tuple[pd.DataFrame, dict]:
+    """
+    Reduce the data of a relational plot to about `max_points` rows in total.
+
+    Each series (combination of `groups`) gets an equal share of the budget.
+    Line plots are first averaged per x value, as seaborn would, and then
+    downsampled with LTTB; scatter plots keep an evenly spaced subset of points.
+
+    Returns
+    -------
+    tuple
+        The reduced data and keyword arguments overriding those passed to
+        seaborn: averaged lines have no spread left to draw a confidence band
+        from, so it is turned off rather than silently collapsing.
+    """
+    import pandas as pd
+
+    if len(df) <= max_points or x not in df.columns or y not in df.columns:
+        return df, {}
+
+    overrides = {}
+    if kind == 'line':
+        averaged = df.groupby(groups + [x], sort=True, dropna=False, as_index=False)[y].mean()
+        if len(averaged) < len(df):
+            overrides['errorbar'] = None
+        df = averaged
+
+    parts = list(df.groupby(groups, sort=False, dropna=False)) if groups else [(None, df)]
+    budget = max(3, max_points // len(parts))
+
+    reduced = []
+    for _, part in parts:
+        if len(part) <= budget:
+            reduced.append(part)
+        elif kind == 'line':
+            part = part.sort_values(x)
+            keep = _lttb(_numeric_axis(part[x]), part[y].to_numpy(dtype=float), budget)
+            reduced.append(part.iloc[keep])
+        else:
+            keep = np.linspace(0, len(part) - 1, budget).astype(int)
+            reduced.append(part.iloc[keep])
+
+    return pd.concat(reduced, ignore_index=True), overrides
+
+
+def _reduce_distribution(df: pd.DataFrame, x: str, y: str, kind: str, groups: list[str], max_points: int) -> tuple[pd.DataFrame, dict]:
+    """
+    Pre-bin the data of a distribution plot into weighted bin centres.
+
+    Only univariate distributions of a numeric column are binned; everything
+    else is returned unchanged.
+
+    Returns
+    -------
+    tuple
+        The binned data and extra keyword arguments for seaborn (the weights and,
+        for histograms, the number of bins seaborn would have picked for the raw data).
+    """
+    import pandas as pd
+
+    has_x, has_y = bool(x) and x in df.columns, bool(y) and y in df.columns
+    if len(df) <= max_points or has_x == has_y:
+        return df, {}
+
+    column = x if has_x else y
+    if not pd.api.types.is_numeric_dtype(df[column]):
+        return df, {}
+
+    values = df[column].to_numpy(dtype=float)
+    finite = np.isfinite(values)
+    if not finite.any():
+        return df, {}
+
+    lo, hi = values[finite].min(), values[finite].max()
+    edges = np.linspace(lo, hi if hi > lo else lo + 1, DISTRIBUTION_BINS + 1)
+    centres = (edges[:-1] + edges[1:]) / 2
+    bins = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, DISTRIBUTION_BINS - 1)
+
+    binned = df.loc[finite, groups].copy()
+    binned[column] = centres[bins[finite]]
+    binned = binned.groupby(groups + [column], dropna=False, as_index=False).size()
+    binned = binned.rename(columns={'size': '_weight'})
+
+    overrides = {'weights': '_weight'}
+    if kind in (None, 'hist'):
+        # Seaborn can't choose bins automatically for weighted data.
+        auto_bins = len(np.histogram_bin_edges(values[finite], bins='auto')) - 1
+        overrides['bins'] = min(auto_bins, DISTRIBUTION_BINS // 4)
+    return binned, overrides
+
+
+def _reduce_categorical(con: duckdb.DuckDBPyConnection, source: str, kind: str, x: str, y: str, groups: list[str], max_points: int) -> tuple[pd.DataFrame, dict]:
+    """
+    Aggregate or sample the data of a categorical plot in DuckDB.
+
+    'bar' and 'point' plots are reduced to one mean per category, 'count' plots
+    to one count per category, and the distributional kinds to a deterministic
+    sample of at most `max_points` rows spread evenly over the categories.
+
+    Parameters
+    ----------
+    con : duckdb.DuckDBPyConnection
+        Connection `source` can be read from.
+    source : str
+        FROM clause expression for the plotted data.
+
+    Returns
+    -------
+    tuple
+        The reduced data and keyword arguments overriding those passed to seaborn.
+    """
+    rel = con.sql(f"SELECT * FROM {source}")
+    types = {c: str(t).split('(')[0] for c, t in zip(rel.columns, rel.types)}
+    names = set(types)
+    axes = _columns(names, x, y)
+
+    # Vertical plots have the value on y; fall back to x for horizontal ones.
+    numeric = [c for c in (y, x) if c in axes and types[c] in _NUMERIC_TYPES]
+    value = numeric[0] if numeric else None
+    categories = _columns(names, *[c for c in axes if c != value], *groups)
+    keys = ', '.join(_quote(c) for c in categories)
+    select_keys = f"{keys}, " if keys else ''
+
+    if kind == 'count' or value is None and kind in _ESTIMATE_KINDS:
+        sql = f"SELECT {select_keys}count(*) AS count FROM {source} GROUP BY ALL ORDER BY ALL"
+        axis = 'y' if x in categories else 'x'
+        return con.execute(sql).df(), {'kind': 'bar', axis: 'count', 'errorbar': None}
+
+    if kind in _ESTIMATE_KINDS:
+        sql = f"SELECT {select_keys}avg({_quote(value)}) AS {_quote(value)} FROM {source} GROUP BY ALL ORDER BY ALL"
+        return con.execute(sql).df(), {'errorbar': None}
+
+    if kind not in _SAMPLE_KINDS:
+        return rel.df(), {}
+
+    n_categories = con.execute(f"SELECT count(*) FROM (SELECT DISTINCT {keys} FROM {source})").fetchone()[0] if keys else 1
+    per_category = max(1, max_points // max(1, n_categories))
+    order = ', '.join(_quote(c) for c in categories + ([value] if value else [])) or '1'
+    partition = f"PARTITION BY {keys}" if keys else ''
+    sql = f"""
+        SELECT * FROM {source}
+        QUALIFY row_number() OVER ({partition} ORDER BY hash({order})) <= {per_category}
+    """
+    return con.execute(sql).df(), {}
@@ -0,0 +1,346 @@
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from .storage import _literal, _quote
+
+if TYPE_CHECKING:
+    import duckdb
+
+
+# Datasets that get hierarchy rollups, built from the levels in their
+# `structure.yaml`: the columns every rollup is also grouped by, and the
+# actual and forecast columns that are summed and compared. Backtests (see
+# `backtesting.py`) read the series' dates from `date` and can also break
+# accuracy down by the `segments` columns.
+ROLLUPS = {
+    'volume_forecasts': {
+        'dimensions': ['business_unit', 'date', 'year', 'month'],
+        'actual': 'volume',
+        'forecast': 'forecast',
+        'date': 'date',
+        'segments': ['business_unit'],
+    },
+}
+
+# Aggregates that give the same result over rollup rows as over the rows they
+# summarise, when applied to a grouping column.
+_DIMENSION_AGGREGATES = {'min', 'max', 'any_value', 'first', 'last', 'arbitrary'}
+_DISTINCT_AGGREGATES = {'count', 'approx_count_distinct'}
+
+
+@dataclass(frozen=True)
+class Rollup:
+    """
+    A pre-aggregated table of a dataset at one level of its hierarchy.
+    Args:
+        table (str): Name of the rollup table.
+        dataset (str): Name of the dataset it summarises.
+        level (str): The finest hierarchy column it is grouped by, or 'total'.
+        dimensions (tuple): All columns it is grouped by.
+        measures (tuple): The dataset columns it holds sums of, under the same names.
+        columns (tuple): All columns of the dataset.
+    """
+    table: str
+    dataset: str
+    level: str
+    dimensions: tuple
+    measures: tuple
+    columns: tuple
+
+
+def _hierarchy(structure: dict) -> tuple[list[str], set]:
+    """
+    Read the levels of a parent -> children hierarchy from `structure.yaml`.
+
+    Every mapping of names to lists of child names is a level; a level's
+    children are the members of the level below it, and the children of the
+    lowest level are the leaves.
+
+    Returns
+    -------
+    tuple
+        The level names from the top down, and the names of the leaves.
+    """
+    levels = {
+        key: value for key, value in structure.items()
+        if isinstance(value, dict) and value and all(isinstance(v, list) for v in value.values())
+    }
+    children = {level: {c for cs in members.values() for c in cs} for level, members in levels.items()}
+    below = {
+        level: other
+        for level in levels for other, members in levels.items()
+        if other != level and children[level] <= set(members)
+    }
+
+    tops = [level for level in levels if level not in below.values()]
+    if len(tops) != 1:
+        return [], set()
+
+    order = [tops[0]]
+    while order[-1] in below:
+        order.append(below[order[-1]])
+    return order, children[order[-1]]
+
+
+def _leaf_column(con: duckdb.DuckDBPyConnection, table: str, candidates: list[str], leaves: set) -> str | None:
+    """
+    Find the column holding the leaves of the hierarchy, which `structure.yaml`
+    lists by value but doesn't name.
+    """
+    if not candidates or not leaves:
+        return None
+    values = ', '.join(_literal(v) for v in sorted(leaves))
+    counts = con.execute(
+        f"SELECT {', '.join(f'count(*) FILTER (WHERE CAST({_quote(c)} AS VARCHAR) IN ({values}))' for c in candidates)} FROM {_quote(table)}"
+    ).fetchone()
+    found = [c for c, n in zip(candidates, counts) if n]
+    return found[0] if len(found) == 1 else None
+
+
+def _define_rollups(con: duckdb.DuckDBPyConnection, name: str, dataset_path: str) -> list[Rollup]:
+    """
+    Work out the rollups of a dataset, one per hierarchy level plus a total,
+    each grouped by the level's column, the columns above it and the
+    dataset's rollup dimensions.
+
+    Returns
+    -------
+    list[Rollup]
+        The rollups, coarsest first; empty if the dataset has none.
+    """
+    config = ROLLUPS.get(name)
+    structure_path = os.path.join(dataset_path, 'structure.yaml')
+    if config is None or not os.path.isfile(structure_path):
+        return []
+
+    import yaml
+
+    with open(structure_path, 'r', encoding='utf-8') as f:
+        levels, leaves = _hierarchy(yaml.safe_load(f) or {})
+
+    columns = [d[0] for d in con.execute(f"SELECT * FROM {_quote(name)} LIMIT 0").description]
+    dimensions = [c for c in config['dimensions'] if c in columns]
+    actual, forecast = config['actual'], config['forecast']
+
+    hierarchy = [level for level in levels if level in columns]
+    others = [c for c in columns if c not in hierarchy + dimensions + [actual, forecast]]
+    leaf = _leaf_column(con, name, others, leaves)
+    if leaf is not None:
+        hierarchy.append(leaf)
+
+    rollups = []
+    for i, level in enumerate(['total'] + hierarchy):
+        table = f"{name}_total" if level == 'total' else f"{name}_by_{level}"
+        rollups.append(Rollup(table, name, level, tuple(hierarchy[:i] + dimensions), (actual, forecast), tuple(columns)))
+    return rollups
+
+
+def _build_rollups(con: duckdb.DuckDBPyConnection, name: str, dataset_path: str) -> list[Rollup]:
+    """
+    (Re)build the rollup tables of a dataset (see `_define_rollups`).
+
+    Every rollup holds the sums of the actual and forecast columns, under
+    their own names, row counts and forecast-error sums (error, absolute and
+    squared error over rows with both values), all of which add up across
+    rows, so they can be further aggregated.
+
+    Returns
+    -------
+    list[Rollup]
+        The rollups, coarsest first; empty if the dataset has none.
+    """
+    rollups = _define_rollups(con, name, dataset_path)
+    for rollup in rollups:
+        con.execute(f"CREATE OR REPLACE TABLE {_quote(rollup.table)} AS {_rollup_query(rollup)} ORDER BY ALL")
+    return rollups
+
+
+def _rollup_query(rollup: Rollup, where: str = '') -> str:
+    a, f = (_quote(m) for m in rollup.measures)
+    return f"""
+        SELECT {', '.join(_quote(k) for k in rollup.dimensions)},
+            sum({a}) AS {a},
+            sum({f}) AS {f},
+            count(*) AS n_rows,
+            count({a}) AS n_actual,
+            count({f} - {a}) AS n_error,
+            sum({f} - {a}) AS error,
+            sum(abs({f} - {a})) AS abs_error,
+            sum(({f} - {a}) ** 2) AS squared_error
+        FROM {_quote(rollup.dataset)} d
+        {where}
+        GROUP BY ALL
+    """
+
+
+def _update_rollups(con: duckdb.DuckDBPyConnection, rollups: list[Rollup], staged: str):
+    """
+    Bring rollups up to date after rows were appended to their dataset.
+
+    Only the rollup rows the new rows (in the table `staged`) fall into are
+    recomputed, from the dataset's rows for the same groups; the other rows
+    are left alone. All rollups are updated in one transaction, so queries see
+    either the old or the new figures.
+    """
+    con.execute("BEGIN TRANSACTION")
+    try:
+        for rollup in rollups:
+            keys = ', '.join(_quote(k) for k in rollup.dimensions)
+            touched = f"(SELECT DISTINCT {keys} FROM {_quote(staged)})"
+            match = ' AND '.join(f"{{0}}.{_quote(k)} IS NOT DISTINCT FROM t.{_quote(k)}" for k in rollup.dimensions)
+            con.execute(f"DELETE FROM {_quote(rollup.table)} r USING {touched} t WHERE {match.format('r')}")
+            con.execute(
+                f"INSERT INTO {_quote(rollup.table)} "
+                + _rollup_query(rollup, f"WHERE EXISTS (SELECT 1 FROM {touched} t WHERE {match.format('d')})")
+            )
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+
+
+def _aggregate_functions(con: duckdb.DuckDBPyConnection) -> set:
+    global _AGGREGATES
+    if _AGGREGATES is None:
+        _AGGREGATES = {
+            row[0] for row in con.execute(
+                "SELECT DISTINCT function_name FROM duckdb_functions() WHERE function_type = 'aggregate'"
+            ).fetchall()
+        } | {'count_star'}
+    return _AGGREGATES
+
+
+_AGGREGATES = None
+
+
+def _parse(con: duckdb.DuckDBPyConnection, sql_query: str) -> dict | None:
+    """
+    Parse a query into DuckDB's JSON syntax tree, if it is a plain SELECT from
+    a single table (no set operations, CTEs or joins); None otherwise.
+    """
+    try:
+        tree = json.loads(con.execute("SELECT json_serialize_sql(?)", [sql_query]).fetchone()[0])
+    except Exception:
+        return None
+    if tree.get('error') or len(tree['statements']) != 1:
+        return None
+
+    node = tree['statements'][0]['node']
+    table = node.get('from_table') or {}
+    if node.get('type') != 'SELECT_NODE' or node['cte_map']['map'] or table.get('type') != 'BASE_TABLE' or table['schema_name']:
+        return None
+    return tree
+
+
+class _NotRoutable(Exception):
+    pass
+
+
+def _needed_columns(node, measures: set, aggregates: set, aliases: set, needed: set) -> bool:
+    """
+    Collect the grouping columns a query needs from the rows it aggregates,
+    raising `_NotRoutable` if it uses the measures other than through `sum`,
+    or anything a rollup can't answer (subqueries, window functions, row
+    counts, `*`).
+
+    Returns
+    -------
+    bool
+        Whether `node` contains an aggregate.
+    """
+    if isinstance(node, list):
+        found = False
+        for child in node:
+            found |= _needed_columns(child, measures, aggregates, aliases, needed)
+        return found
+    if not isinstance(node, dict):
+        return False
+
+    kind = node.get('class')
+    if node.get('type') == 'SELECT_NODE' or kind in ('SUBQUERY', 'WINDOW', 'STAR', 'LAMBDA'):
+        raise _NotRoutable()
+
+    if kind == 'COLUMN_REF':
+        column = node['column_names'][-1]
+        if column in measures:
+            raise _NotRoutable()
+        if not (len(node['column_names']) == 1 and column in aliases):
+            needed.add(column)
+        return False
+
+    if kind == 'FUNCTION' and node['function_name'] in aggregates:
+        function, children = node['function_name'], node['children']
+        is_sum_of_measure = (
+            function == 'sum' and not node['distinct'] and len(children) == 1
+            and children[0].get('class') == 'COLUMN_REF' and children[0]['column_names'][-1] in measures
+        )
+        if not is_sum_of_measure:
+            if not (function in _DIMENSION_AGGREGATES or function in _DISTINCT_AGGREGATES and node['distinct']):
+                raise _NotRoutable()
+            _needed_columns(children, measures, aggregates, aliases, needed)
+        _needed_columns([node.get('filter'), node.get('order_bys')], measures, aggregates, aliases, needed)
+        return True
+
+    found = False
+    for key, value in node.items():
+        if isinstance(value, (dict, list)):
+            found |= _needed_columns(value, measures, aggregates, aliases, needed)
+    return found
+
+
+def _route(con: duckdb.DuckDBPyConnection, sql_query: str, rollups: list[Rollup]) -> str | None:
+    """
+    Rewrite an aggregate query over a dataset to read the coarsest rollup
+    that can answer it.
+
+    A query can be routed when it reads a single dataset with rollups, groups
+    or aggregates, refers only to columns a rollup is grouped by, and uses the
+    actual and forecast columns only as `sum(column)`, which summing the
+    rollup's sums gives exactly.
+
+    Returns
+    -------
+    str | None
+        The rewritten query, or None if no rollup can answer it.
+    """
+    if not rollups:
+        return None
+
+    tree = _parse(con, sql_query)
+    if tree is None:
+        return None
+
+    node = tree['statements'][0]['node']
+    table = node['from_table']
+
+    candidates = [r for r in rollups if r.dataset == table['table_name']]
+    if not candidates:
+        return None
+
+    # Names that only exist as select list aliases (e.g. in ORDER BY) aren't
+    # read from the rows.
+    aliases = {e['alias'] for e in node['select_list'] if e.get('alias')} - set(candidates[0].columns)
+    needed = set()
+    body = [v for k, v in node.items() if k not in ('from_table', 'cte_map')]
+    try:
+        aggregated = _needed_columns(body, set(candidates[0].measures), _aggregate_functions(con), aliases, needed)
+    except _NotRoutable:
+        return None
+
+    grouped = node['group_expressions'] or node['aggregate_handling'] == 'FORCE_AGGREGATES' or any(
+        m['type'] == 'DISTINCT_MODIFIER' for m in node['modifiers']
+    )
+    if not (aggregated or grouped):
+        return None
+
+    for rollup in candidates:
+        if needed <= set(rollup.dimensions):
+            # Keep the dataset's name for column references qualified with it.
+            table['alias'] = table.get('alias') or table['table_name']
+            table['table_name'] = rollup.table
+            return con.execute("SELECT json_deserialize_sql(?)", [json.dumps(tree)]).fetchone()[0]
+    return None
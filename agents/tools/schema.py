@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import json
+import os
+from typing import TYPE_CHECKING
+
+from .paging import _jsonable
+from .storage import STORAGE_DIR, _literal, _quote
+
+if TYPE_CHECKING:
+    import duckdb
+
+
+# Text columns with at most this many distinct values are listed in full (up
+# to TOP_VALUES of them, most frequent first) in the agents' instructions, so
+# filters use the exact spelling; values longer than MAX_VALUE_LENGTH are
+# left out to keep the instructions compact.
+MAX_CATEGORIES = int(os.environ.get('AI_ANALYST_SCHEMA_MAX_CATEGORIES', 64))
+TOP_VALUES = int(os.environ.get('AI_ANALYST_SCHEMA_TOP_VALUES', 25))
+MAX_VALUE_LENGTH = 80
+
+_CATEGORICAL_TYPES = ('VARCHAR', 'BOOLEAN')
+
+
+def _schema_path(dataset_path: str, manifest: dict) -> str:
+    # Kept with the stored version, so it is removed along with it.
+    return os.path.join(dataset_path, STORAGE_DIR, manifest['directory'], 'schema.json')
+
+
+def _read_schema(dataset_path: str, manifest: dict) -> dict | None:
+    try:
+        with open(_schema_path(dataset_path, manifest), 'r', encoding='utf-8') as f:
+            schema = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return schema if schema.get('version') == manifest['version'] else None
+
+
+def _write_schema(dataset_path: str, schema: dict):
+    path = _schema_path(dataset_path, {'directory': schema['directory']})
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(schema, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def _build_schema(con: duckdb.DuckDBPyConnection, name: str, manifest: dict) -> dict:
+    """
+    Profile a stored version of a dataset: its row count, and per column its
+    type, null count, min, max and approximate distinct count, plus the most
+    frequent values of low-cardinality text columns.
+
+    Two scans: one for the statistics of every column, and one for the values
+    of the low-cardinality columns.
+    """
+    columns = [tuple(c) for c in manifest['columns']]
+    aggregates = ['count(*)']
+    for c, _ in columns:
+        q = _quote(c)
+        aggregates += [f'count({q})', f'min({q})', f'max({q})', f'approx_count_distinct({q})']
+    values = con.execute(f"SELECT {', '.join(aggregates)} FROM {_quote(name)}").fetchone()
+
+    profile = []
+    for i, (c, t) in enumerate(columns):
+        count, lo, hi, distinct = values[1 + 4 * i: 5 + 4 * i]
+        profile.append({
+            'name': c,
+            'type': t,
+            'nulls': values[0] - count,
+            'min': _jsonable(lo),
+            'max': _jsonable(hi),
+            'distinct': distinct,
+        })
+
+    categorical = [p for p in profile if p['type'] in _CATEGORICAL_TYPES and 0 < p['distinct'] <= MAX_CATEGORIES]
+    if categorical:
+        # approx_count_distinct can be a little off, so the exact count comes
+        # along with the values.
+        selects = [
+            f"SELECT {_literal(p['name'])} AS col, CAST({_quote(p['name'])} AS VARCHAR) AS value, count(*) AS n "
+            f"FROM {_quote(name)} WHERE {_quote(p['name'])} IS NOT NULL GROUP BY ALL"
+            for p in categorical
+        ]
+        rows = con.execute(
+            f"SELECT col, list(value ORDER BY n DESC, value), count(*) FROM ({' UNION ALL '.join(selects)}) GROUP BY col"
+        ).fetchall()
+        found = {col: (vals, n) for col, vals, n in rows}
+        for p in categorical:
+            vals, n = found.get(p['name'], ([], 0))
+            p['distinct'] = n
+            if n <= MAX_CATEGORIES:
+                p['values'] = vals[:TOP_VALUES]
+
+    return {
+        'version': manifest['version'],
+        'directory': manifest['directory'],
+        'dataset': name,
+        'rows': values[0],
+        'columns': profile,
+    }
+
+
+def _schema_instruction(schema: dict, values: bool = True) -> str:
+    """
+    Render a profile compactly for an agent's instructions: a line per column
+    with its type and range or values. Without `values`, just the column
+    names and types.
+    """
+    if not values:
+        return f"{schema['dataset']}({', '.join(c['name'] + ' ' + c['type'] for c in schema['columns'])})"
+
+    def fmt(value) -> str:
+        if isinstance(value, float):
+            return f"{value:.6g}"
+        return str(value)
+
+    lines = [f"{schema['dataset']}: {schema['rows']:,} rows"]
+    for c in schema['columns']:
+        line = f"- {c['name']} {c['type']}"
+        if c['min'] is None:
+            line += ': always null'
+        elif 'values' in c:
+            shown = [v for v in c['values'] if len(v) <= MAX_VALUE_LENGTH]
+            if shown:
+                line += ': ' + ', '.join(_literal(v) for v in shown)
+            if len(shown) < c['distinct']:
+                line += f"{' ...' if shown else ':'} ({c['distinct']} distinct)"
+        elif c['type'] in _CATEGORICAL_TYPES:
+            line += f": ~{c['distinct']:,} distinct, e.g. {_literal(fmt(c['min'])[:MAX_VALUE_LENGTH])}"
+        else:
+            line += f": {fmt(c['min'])} to {fmt(c['max'])}"
+        if c['nulls']:
+            line += f", {c['nulls'] / schema['rows']:.0%} null"
+        lines.append(line)
+    return '\n'.join(lines)
@@ -1,10 +1,104 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
 import pandas as pd
-from prophet import Prophet
 
-def _forecast(y: pd.Series, forecast_horizon: int, freq: str) -> pd.Series:
+from .instrumentation import current_span, span
+from .smoothing import _ets, _seasonal_naive
+
+
+def _fingerprint(y: pd.Series, model_kwargs: dict) -> str:
+    """
+    Hash a series' values and index together with the model settings.
+    """
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(y, index=True).values.tobytes())
+    digest.update(json.dumps(model_kwargs, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class _ModelCache:
+    """
+    Two-tier cache of fitted Prophet models keyed by series fingerprint.
+
+    The first tier is an in-memory LRU holding up to `max_models` models. If
+    `path` is set, models are also written there as Prophet JSON so they survive
+    restarts and are shared between the worker processes forecasts run in.
+    """
+
+    def __init__(self, max_models: int = 32, path: str | None = None):
+        self.max_models = max_models
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.json")
+
+    def get(self, key: str) -> 'Prophet | None':
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return model
+
+        if self.path is not None and os.path.exists(self._file(key)):
+            from prophet.serialize import model_from_json
+
+            with open(self._file(key), 'r', encoding='utf-8') as f:
+                model = model_from_json(f.read())
+            self._remember(key, model)
+            with self._lock:
+                self.hits += 1
+            return model
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, model: 'Prophet'):
+        self._remember(key, model)
+
+        if self.path is not None:
+            from prophet.serialize import model_to_json
+
+            os.makedirs(self.path, exist_ok=True)
+            # Write then rename, so other processes never read a partial file.
+            tmp = f"{self._file(key)}.{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(model_to_json(model))
+            os.replace(tmp, self._file(key))
+
+    def _remember(self, key: str, model: 'Prophet'):
+        with self._lock:
+            self._models[key] = model
+            self._models.move_to_end(key)
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+
+
+_models = _ModelCache(
+    max_models=int(os.environ.get('AI_ANALYST_MODEL_CACHE_SIZE', 32)),
+    path=os.environ.get('AI_ANALYST_MODEL_CACHE_DIR')
+)
+
+
+def _prophet_forecast(y: pd.Series, forecast_horizon: int, freq: str) -> pd.Series:
     """
     Forecast future values using Prophet directly.
 
+    Fitted models are cached by a fingerprint of the series and the model
+    settings, so asking for the same series again (e.g. at another horizon)
+    only pays for the prediction.
+
     Parameters:
     - y: pd.Series with a DatetimeIndex
     - forecast_horizon: number of future periods to forecast
@@ -12,26 +106,158 @@ def _forecast(y: pd.Series, forecast_horizon: int, freq: str) -> pd.Series:
     Returns:
     - pd.Series: predicted values with future datetime index
     """
-    if not isinstance(y.index, pd.DatetimeIndex):
-        raise ValueError("Input series must have a DatetimeIndex.")
-
-    # Prepare data for Prophet
-    df = y.reset_index()
-    df.columns = ['ds', 'y']
-
     prophet_kwargs = {
         "seasonality_mode": "multiplicative"
     }
 
-    # Fit model
-    model = Prophet(**prophet_kwargs)
-    model.fit(df)
+    key = _fingerprint(y, prophet_kwargs)
+    model = _models.get(key)
+    current_span().set(model_cache_hit=model is not None)
+
+    if model is None:
+        # Prophet pulls in cmdstanpy and matplotlib, so it is only loaded
+        # when a Prophet forecast is actually requested.
+        from prophet import Prophet
+
+        # Prepare data for Prophet
+        df = y.reset_index()
+        df.columns = ['ds', 'y']
+
+        # Fit model
+        with span('forecast.fit', method='prophet', n_obs=len(df)):
+            model = Prophet(**prophet_kwargs)
+            model.fit(df)
+        _models.put(key, model)
 
     # Create future dataframe
-    future = model.make_future_dataframe(periods=forecast_horizon, freq=freq)
-    forecast = model.predict(future)
+    with span('forecast.predict', method='prophet', horizon=forecast_horizon):
+        future = model.make_future_dataframe(periods=forecast_horizon, freq=freq)
+        forecast = model.predict(future)
 
     # Extract predicted values for the future only
     forecast_result = forecast.set_index("ds")["yhat"][-forecast_horizon:]
 
     return forecast_result
+
+
+# Backends that forecast a batch of equally long series given as a 2-D array.
+_ARRAY_BACKENDS = {
+    'ets': _ets,
+    'seasonal_naive': _seasonal_naive,
+}
+
+METHODS = ('auto', 'prophet', *_ARRAY_BACKENDS)
+
+# 'auto' only uses Prophet for series with at least this many seasons of data.
+AUTO_PROPHET_MIN_SEASONS = int(os.environ.get('AI_ANALYST_AUTO_PROPHET_MIN_SEASONS', 3))
+
+
+def _season_length(freq: str) -> int:
+    """
+    Number of periods in a year (or a week, for daily data) for a pandas frequency.
+    """
+    try:
+        name = pd.tseries.frequencies.to_offset(freq).name.upper()
+    except ValueError:
+        name = freq.upper()
+    for prefix, period in (('MS', 12), ('ME', 12), ('M', 12), ('QS', 4), ('QE', 4), ('Q', 4), ('W', 52), ('D', 7), ('B', 5), ('H', 24)):
+        if name.startswith(prefix):
+            return period
+    return 1
+
+
+def _choose_method(y: pd.Series, freq: str) -> str:
+    """
+    Pick a backend for 'auto': Prophet only pays off on long series with some
+    structure, everything else goes to the cheap exponential smoothing engine.
+    """
+    y = y.dropna()
+    period = _season_length(freq)
+    if len(y) < AUTO_PROPHET_MIN_SEASONS * max(period, 12):
+        return 'ets'
+
+    # A series that barely correlates with its own past is mostly noise; a
+    # constant one has no autocorrelation at all (NaN).
+    with np.errstate(invalid='ignore', divide='ignore'):
+        autocorr = y.autocorr(lag=1)
+    if np.isnan(autocorr) or abs(autocorr) < 0.3:
+        return 'ets'
+    return 'prophet'
+
+
+def _clean(y: pd.Series) -> pd.Series:
+    """
+    Drop leading/trailing missing values and interpolate interior gaps, since
+    the array backends need evenly spaced observations.
+    """
+    y = y.sort_index()
+    if y.first_valid_index() is None:
+        return y.iloc[:0]
+    y = y.loc[y.first_valid_index():y.last_valid_index()]
+    return y.interpolate(limit_area='inside')
+
+
+def _forecast_many(ys: list[pd.Series], forecast_horizon: int, freq: str, method: str) -> list[pd.Series]:
+    """
+    Forecast a batch of series with one of the array backends.
+
+    Series that share their length and last date are stacked
+    into one 2-D array and forecast together in a single vectorised call.
+
+    Returns
+    -------
+    list of pd.Series
+        Forecasts in the same order as `ys`, indexed by future date.
+    """
+    backend = _ARRAY_BACKENDS[method]
+    period = _season_length(freq)
+
+    cleaned = [_clean(y) for y in ys]
+    batches = {}
+    for i, y in enumerate(cleaned):
+        if y.empty:
+            raise ValueError("Input series has no values to forecast from.")
+        batches.setdefault((len(y), y.index[-1]), []).append(i)
+
+    results = [None] * len(ys)
+    for (_, last), members in batches.items():
+        Y = np.vstack([cleaned[i].to_numpy(dtype=float) for i in members])
+        with span('forecast.fit', method=method, n_series=Y.shape[0], n_obs=Y.size):
+            preds = backend(Y, forecast_horizon, period)
+
+        # As Prophet does: the range only starts at `last` if it is on the
+        # frequency (e.g. not for 'ME' on month-start dates).
+        future = pd.date_range(start=last, periods=forecast_horizon + 1, freq=freq)
+        future = future[future > last][:forecast_horizon]
+        future.name = 'ds'
+        for i, row in zip(members, preds):
+            results[i] = pd.Series(row, index=future, name='yhat')
+    return results
+
+
+def _forecast(y: pd.Series, forecast_horizon: int, freq: str, method: str = 'prophet') -> pd.Series:
+    """
+    Forecast future values of a single series with the chosen backend.
+
+    Parameters:
+    - y: pd.Series with a DatetimeIndex
+    - forecast_horizon: number of future periods to forecast
+    - freq: pandas frequency of the series
+    - method: 'prophet', 'ets', 'seasonal_naive' or 'auto' to pick one from the series
+
+    Returns:
+    - pd.Series: predicted values with future datetime index
+    """
+    if not isinstance(y.index, pd.DatetimeIndex):
+        raise ValueError("Input series must have a DatetimeIndex.")
+    if method not in METHODS:
+        raise ValueError(f"Unknown forecast method '{method}', expected one of {METHODS}.")
+
+    with span('forecast', method=method, n_obs=len(y), horizon=forecast_horizon) as s:
+        if method == 'auto':
+            method = _choose_method(y, freq)
+            s.set(chosen_method=method)
+
+        if method == 'prophet':
+            return _prophet_forecast(y, forecast_horizon, freq)
+        return _forecast_many([y], forecast_horizon, freq, method)[0]
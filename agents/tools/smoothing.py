@@ -0,0 +1,118 @@
+import itertools
+
+import numpy as np
+
+
+# Smoothing parameters tried for every series; the combination with the lowest
+# one-step-ahead squared error is kept. A damping factor of 0 switches the trend off.
+ALPHAS = (0.1, 0.3, 0.5, 0.8)
+BETAS = (0.05, 0.2)
+PHIS = (0.0, 0.8, 0.9, 0.98, 1.0)
+GAMMAS = (0.05, 0.2, 0.4)
+
+
+def _seasonal_naive(Y: np.ndarray, horizon: int, period: int) -> np.ndarray:
+    """
+    Repeat the last observed season (or the last value for short series).
+
+    Parameters
+    ----------
+    Y : np.ndarray
+        Array of shape (n_series, n_obs) without missing values.
+    horizon : int
+        Number of periods to forecast.
+    period : int
+        Season length in periods.
+
+    Returns
+    -------
+    np.ndarray
+        Forecasts of shape (n_series, horizon).
+    """
+    n_obs = Y.shape[1]
+    if period <= 1 or n_obs < period:
+        return np.repeat(Y[:, -1:], horizon, axis=1)
+
+    last_season = Y[:, n_obs - period:]
+    return last_season[:, np.arange(horizon) % period]
+
+
+def _ets(Y: np.ndarray, horizon: int, period: int) -> np.ndarray:
+    """
+    Additive Holt-Winters with optional damped trend, fitted to many series at once.
+
+    Every series is smoothed with every parameter combination in one pass over
+    time, working on arrays of shape (n_series, n_combinations), and the best
+    combination per series is used to forecast. Seasonality is only modelled
+    when there are at least three full seasons of data: the first two are used
+    to initialise it, and with nothing left over it just memorises them.
+
+    Parameters
+    ----------
+    Y : np.ndarray
+        Array of shape (n_series, n_obs) without missing values.
+    horizon : int
+        Number of periods to forecast.
+    period : int
+        Season length in periods.
+
+    Returns
+    -------
+    np.ndarray
+        Forecasts of shape (n_series, horizon).
+    """
+    Y = np.asarray(Y, dtype=float)
+    n_series, n_obs = Y.shape
+
+    if n_obs < 2:
+        return np.repeat(Y[:, -1:], horizon, axis=1)
+
+    seasonal = period > 1 and n_obs >= 3 * period
+    m = period if seasonal else 1
+
+    grid = np.array(list(itertools.product(ALPHAS, BETAS, PHIS, GAMMAS if seasonal else (0.0,))))
+    alpha, beta, phi, gamma = (grid[:, i][None, :] for i in range(4))
+    n_grid = len(grid)
+
+    # Initial state, placed just before the first observation, from the first
+    # two seasons (or the first two points).
+    if seasonal:
+        first = Y[:, :m].mean(axis=1)
+        second = Y[:, m:2 * m].mean(axis=1)
+        trend0 = (second - first) / m
+        level0 = first - trend0 * (m + 1) / 2
+        season0 = Y[:, :m] - (level0[:, None] + trend0[:, None] * np.arange(1, m + 1)[None, :])
+    else:
+        trend0 = Y[:, 1] - Y[:, 0]
+        level0 = Y[:, 0] - trend0
+        season0 = np.zeros((n_series, 1))
+
+    level = np.repeat(level0[:, None], n_grid, axis=1)
+    trend = np.repeat(trend0[:, None], n_grid, axis=1)
+    season = np.repeat(season0[:, None, :], n_grid, axis=1)
+    sse = np.zeros((n_series, n_grid))
+
+    for t in range(n_obs):
+        y = Y[:, t][:, None]
+        s = season[:, :, t % m]
+
+        err = y - (level + phi * trend + s)
+        sse += err ** 2
+
+        new_level = alpha * (y - s) + (1 - alpha) * (level + phi * trend)
+        trend = beta * (new_level - level) + (1 - beta) * phi * trend
+        season[:, :, t % m] = gamma * (y - new_level) + (1 - gamma) * s
+        level = new_level
+
+    best = np.argmin(sse, axis=1)
+    rows = np.arange(n_series)
+    level, trend = level[rows, best], trend[rows, best]
+    phi_best = grid[best, 2]
+    season = season[rows, best, :]
+
+    steps = np.arange(1, horizon + 1)
+    # Sum of phi^1..phi^h for every series and step.
+    damped = np.cumsum(phi_best[:, None] ** steps[None, :], axis=1)
+    season_idx = (n_obs + steps - 1) % m
+
+    return level[:, None] + damped * trend[:, None] + season[:, season_idx]
@@ -0,0 +1,461 @@
+from __future__ import annotations
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+if TYPE_CHECKING:
+    import duckdb
+    import pyarrow as pa
+
+
+# Hive partitioning of each dataset's Parquet copy, chosen so the filters the
+# agents use most prune whole directories. Datasets not listed here are
+# stored unpartitioned.
+PARTITION_BY = {
+    'volume_forecasts': ['business_unit', 'year'],
+    'business_metrics': ['period_type', 'metric_name'],
+}
+
+# Name of the directory, inside each dataset directory, holding its Parquet copies.
+STORAGE_DIR = 'parquet'
+
+COMPRESSION = os.environ.get('AI_ANALYST_PARQUET_COMPRESSION', 'zstd')
+
+# How the datasets are read. 'parquet' scans the compressed Parquet copy, and
+# every process builds its own rollup tables in memory. 'arrow' also writes
+# each version and its rollups out once as uncompressed Arrow IPC files, which
+# every process memory-maps and DuckDB scans in place, so several server
+# workers on the same database folder share one copy of the data through the
+# page cache, at the cost of rewriting the files on every refresh.
+STORAGE_FORMAT = os.environ.get('AI_ANALYST_STORAGE_FORMAT', 'parquet')
+
+# Bytes at the end of a source file that are hashed to recognise it when it
+# has grown: if they are unchanged, the file is taken to have been appended to.
+TAIL_BYTES = 64 * 1024
+
+
+def _literal(value) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _quote(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _sources(dataset_path: str) -> list[str]:
+    """
+    The source files of a dataset: `data.csv`, plus any `data*.csv` files
+    dropped next to it (e.g. one per appended month).
+    """
+    return sorted(glob.glob(os.path.join(dataset_path, 'data*.csv')))
+
+
+def _source_stats(dataset_path: str) -> tuple:
+    """
+    Name, mtime and size of every source file, to cheaply tell if anything changed.
+    """
+    stats = []
+    for path in _sources(dataset_path):
+        st = os.stat(path)
+        stats.append((os.path.basename(path), st.st_mtime_ns, st.st_size))
+    return tuple(stats)
+
+
+def _file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Hash the contents of a file without reading it into memory in one go.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _range_digest(path: str, start: int, stop: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = stop - start
+        while remaining > 0:
+            chunk = f.read(min(remaining, 1 << 20))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def _file_entry(path: str, checksum: str) -> dict:
+    st = os.stat(path)
+    return {
+        'mtime_ns': st.st_mtime_ns,
+        'size': st.st_size,
+        'checksum': checksum,
+        'tail': _range_digest(path, max(0, st.st_size - TAIL_BYTES), st.st_size),
+    }
+
+
+def _changes(dataset_path: str, manifest: dict | None) -> tuple[dict, list, bool]:
+    """
+    Compare the source files with the manifest of the stored version.
+
+    A file that grew and still ends, at its old size, with the bytes it ended
+    with before was appended to, and only the bytes after its old size are new.
+    A file that isn't in the manifest is new in full, and one that was only
+    touched (same checksum) is unchanged. Anything else (a file that shrank,
+    was rewritten or was removed) means the stored data can't be patched.
+
+    Returns
+    -------
+    tuple
+        The manifest entries of the current source files, the appended pieces
+        as (path, offset) pairs, and whether a full rebuild is needed.
+    """
+    previous = (manifest or {}).get('files', {})
+    files, appended = {}, []
+    rebuild = manifest is None
+
+    paths = _sources(dataset_path)
+    if set(previous) - {os.path.basename(p) for p in paths}:
+        rebuild = True
+
+    for path in paths:
+        name = os.path.basename(path)
+        st = os.stat(path)
+        old = previous.get(name)
+
+        if old is not None and (old['mtime_ns'], old['size']) == (st.st_mtime_ns, st.st_size):
+            files[name] = old
+        elif old is None:
+            files[name] = _file_entry(path, _file_digest(path))
+            appended.append((path, 0))
+        elif st.st_size > old['size'] and _range_digest(path, max(0, old['size'] - TAIL_BYTES), old['size']) == old['tail']:
+            # Chain the checksum instead of re-hashing the whole history.
+            added = _range_digest(path, old['size'], st.st_size)
+            files[name] = _file_entry(path, hashlib.sha256(f"{old['checksum']}+{added}".encode('utf-8')).hexdigest())
+            appended.append((path, old['size']))
+        else:
+            files[name] = _file_entry(path, _file_digest(path))
+            rebuild |= files[name]['checksum'] != old['checksum']
+
+    return files, appended, rebuild
+
+
+def _stage(con: duckdb.DuckDBPyConnection, table: str, pieces: list, columns: list) -> str:
+    """
+    Load appended pieces of source files into a temporary table, with the
+    column types of the stored data.
+    """
+    types = '{' + ', '.join(f"{_literal(c)}: {_literal(t)}" for c, t in columns) + '}'
+    selects = []
+    tmp_files = []
+    for path, offset in pieces:
+        if offset:
+            # Only the new bytes are parsed, behind the file's header line.
+            with open(path, 'rb') as src:
+                header = src.readline()
+                src.seek(offset)
+                fd, tmp_path = tempfile.mkstemp(suffix='.csv')
+                with os.fdopen(fd, 'wb') as dst:
+                    dst.write(header)
+                    shutil.copyfileobj(src, dst)
+            tmp_files.append(tmp_path)
+            path = tmp_path
+        selects.append(f"SELECT * FROM read_csv({_literal(path)}, HEADER=TRUE, columns={types})")
+
+    try:
+        con.execute(f"CREATE OR REPLACE TEMP TABLE {_quote(table)} AS {' UNION ALL BY NAME '.join(selects)}")
+    finally:
+        for tmp_path in tmp_files:
+            os.remove(tmp_path)
+    return table
+
+
+def _write(con: duckdb.DuckDBPyConnection, source: str, target: str, partition_by: list[str], append: bool):
+    """
+    Write the rows of `source` as compressed Parquet under `target`.
+
+    Every file gets a unique name, so files written by different refreshes
+    never clash, and a partition's file names identify its contents.
+    """
+    options = ["FORMAT PARQUET", f"COMPRESSION {COMPRESSION}"]
+    if partition_by:
+        options += [
+            f"PARTITION_BY ({', '.join(_quote(c) for c in partition_by)})",
+            "FILENAME_PATTERN 'part_{uuid}'",
+        ]
+        if append:
+            options.append("APPEND")
+        destination = target
+    else:
+        destination = os.path.join(target, f"part_{uuid.uuid4()}.parquet")
+    con.execute(f"COPY (SELECT * FROM {source}) TO {_literal(destination)} ({', '.join(options)})")
+
+
+def _partitions(target: str) -> dict:
+    """
+    Map every partition directory of a stored version to a digest of the
+    files in it, which only changes when the partition is written to.
+    """
+    files = {}
+    for path in glob.glob(os.path.join(target, '**', '*.parquet'), recursive=True):
+        partition = os.path.relpath(os.path.dirname(path), target)
+        files.setdefault(partition, []).append(os.path.basename(path))
+    return {
+        partition: hashlib.sha256('\n'.join(sorted(names)).encode('utf-8')).hexdigest()[:16]
+        for partition, names in files.items()
+    }
+
+
+@contextmanager
+def _locked(dataset_path: str):
+    """
+    Hold an exclusive lock on a dataset's storage across processes, so that
+    of several processes sharing a database folder only one refreshes the
+    dataset at a time and the others pick up the version it wrote.
+    """
+    storage = os.path.join(dataset_path, STORAGE_DIR)
+    os.makedirs(storage, exist_ok=True)
+    with open(os.path.join(storage, '.lock'), 'a') as f:
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _read_manifest(dataset_path: str) -> dict | None:
+    path = os.path.join(dataset_path, STORAGE_DIR, 'manifest.json')
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.isdir(os.path.join(dataset_path, STORAGE_DIR, manifest.get('directory', ''))):
+        return None
+    return manifest
+
+
+def _write_manifest(dataset_path: str, manifest: dict):
+    path = os.path.join(dataset_path, STORAGE_DIR, 'manifest.json')
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def _prune(storage: str, keep: set[str]):
+    """
+    Remove the Parquet copies of earlier versions, except those in `keep`.
+    """
+    for name in os.listdir(storage):
+        if name not in keep and os.path.isdir(os.path.join(storage, name)):
+            shutil.rmtree(os.path.join(storage, name), ignore_errors=True)
+
+
+def _ingest(con: duckdb.DuckDBPyConnection, name: str, dataset_path: str, manifest: dict | None) -> tuple[dict, str | None]:
+    """
+    Bring the Parquet copy of a dataset up to date with its source files.
+
+    Each version is stored under `<dataset>/parquet/<version>`, described by
+    `manifest.json` next to it: the mtime, size and checksum of every source
+    file, the column types, and a digest per partition. When the sources were
+    only appended to (or new `data*.csv` files added), just the new rows are
+    parsed and written as extra files into the partitions they belong to; the
+    rest of the previous version is hard-linked into the new one, so the cost
+    of a refresh depends on the new data, not on the length of the history.
+    Any other change rebuilds the copy in full.
+
+    Every write goes to a directory of its own, so a version directory is
+    never changed once in use (even when the sources return to an earlier
+    version); the previous one is kept so queries still reading it are not
+    disturbed, and older ones are removed.
+
+    Returns
+    -------
+    tuple
+        The manifest of the current version and, after an incremental refresh,
+        the name of a temporary table holding the new rows (None otherwise).
+        The caller drops it once done with it.
+    """
+    files, appended, rebuild = _changes(dataset_path, manifest)
+    if not rebuild and not appended:
+        if manifest['files'] != files:
+            manifest = {**manifest, 'files': files}
+            _write_manifest(dataset_path, manifest)
+        return manifest, None
+
+    version = hashlib.sha256(
+        ''.join(f"{n}={e['checksum']};" for n, e in sorted(files.items())).encode('utf-8')
+    ).hexdigest()
+    storage = os.path.join(dataset_path, STORAGE_DIR)
+    directory = f"{version[:16]}-{uuid.uuid4().hex[:8]}"
+    target = os.path.join(storage, directory)
+    tmp = f"{target}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(storage, exist_ok=True)
+    partition_by = PARTITION_BY.get(name, [])
+
+    staged = None
+    if rebuild:
+        paths = ', '.join(_literal(p) for p in _sources(dataset_path))
+        source = f"read_csv_auto([{paths}], HEADER=TRUE, union_by_name=true)"
+        columns = [(c, str(t)) for c, t in zip(*[getattr(con.sql(f"SELECT * FROM {source} LIMIT 0"), a) for a in ('columns', 'types')])]
+        os.makedirs(tmp)
+        _write(con, source, tmp, [c for c in partition_by if c in dict(columns)], append=False)
+    else:
+        columns = [tuple(c) for c in manifest['columns']]
+        staged = _stage(con, f"_staged_{name}", appended, columns)
+        shutil.copytree(
+            os.path.join(storage, manifest['directory']), tmp, copy_function=os.link,
+            ignore=shutil.ignore_patterns('*.arrow', '*.json'),
+        )
+        _write(con, _quote(staged), tmp, [c for c in partition_by if c in dict(columns)], append=True)
+
+    os.replace(tmp, target)
+
+    new_manifest = {
+        'version': version,
+        'directory': directory,
+        'files': files,
+        'columns': [list(c) for c in columns],
+        'partition_by': [c for c in partition_by if c in dict(columns)],
+        'partitions': _partitions(target),
+    }
+    _write_manifest(dataset_path, new_manifest)
+    _prune(storage, {directory} | ({manifest['directory']} if manifest else set()))
+    return new_manifest, staged
+
+
+def _view_query(dataset_path: str, manifest: dict) -> str:
+    """
+    A query reading a stored version back, with the columns in their original
+    order and partition directories pruned by filters on their columns.
+    """
+    pattern = os.path.join(dataset_path, STORAGE_DIR, manifest['directory'], '**', '*.parquet')
+    return (
+        f"SELECT {', '.join(_quote(c) for c, _ in manifest['columns'])} "
+        f"FROM read_parquet({_literal(pattern)}, hive_partitioning=true)"
+    )
+
+
+def _arrow_path(dataset_path: str, manifest: dict, table: str) -> str:
+    return os.path.join(dataset_path, STORAGE_DIR, manifest['directory'], f"{table}.arrow")
+
+
+def _materialise(con: duckdb.DuckDBPyConnection, query: str, path: str) -> str:
+    """
+    Write the result of a query out as an uncompressed Arrow IPC file at
+    `path`, unless it already has been, and return the path.
+
+    The result is streamed batch by batch and the file only moved into place
+    once complete, so processes never map a partial file.
+    """
+    import pyarrow as pa
+
+    if os.path.isfile(path):
+        return path
+
+    result = con.execute(query).arrow()
+    batches = result.to_batches() if isinstance(result, pa.Table) else result
+    with pa.OSFile(f"{path}.tmp", 'wb') as sink, pa.ipc.new_file(sink, result.schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+    os.replace(f"{path}.tmp", path)
+    return path
+
+
+def _map(path: str) -> pa.Table:
+    """
+    Memory-map an Arrow IPC file as a table, without copying it: its pages
+    are read from, and shared through, the page cache.
+    """
+    import pyarrow as pa
+
+    with pa.ipc.open_file(pa.memory_map(path, 'r')) as reader:
+        return reader.read_all()
+
+
+def _has_subquery(node) -> bool:
+    if isinstance(node, list):
+        return any(_has_subquery(child) for child in node)
+    if not isinstance(node, dict):
+        return False
+    if node.get('class') == 'SUBQUERY' or node.get('type') == 'SELECT_NODE':
+        return True
+    return any(_has_subquery(value) for value in node.values() if isinstance(value, (dict, list)))
+
+
+def _partition_scope(node: dict, partition_by: list[str]) -> dict:
+    """
+    Values a query's top-level WHERE clause pins partition columns to, from
+    `col = constant` and `col IN (constants)` conditions joined by AND.
+
+    A query with a subquery anywhere (e.g. comparing with an average over the
+    whole dataset) can read other partitions, so it is not pinned to any.
+    """
+    where = node.get('where_clause')
+    if where is None or _has_subquery(list(node.values())):
+        return {}
+
+    conditions = where['children'] if where.get('type') == 'CONJUNCTION_AND' else [where]
+    scope = {}
+    for condition in conditions:
+        if condition.get('type') == 'COMPARE_EQUAL':
+            operands = [condition['left'], condition['right']]
+            columns = [o for o in operands if o.get('class') == 'COLUMN_REF']
+            constants = [o for o in operands if o.get('class') == 'CONSTANT']
+        elif condition.get('type') == 'COMPARE_IN':
+            columns = condition['children'][:1]
+            constants = condition['children'][1:]
+            if columns[0].get('class') != 'COLUMN_REF' or any(c.get('class') != 'CONSTANT' for c in constants):
+                continue
+        else:
+            continue
+
+        if len(columns) != 1 or not constants:
+            continue
+        column = columns[0]['column_names'][-1]
+        if column in partition_by and not any(c['value']['is_null'] for c in constants):
+            values = {str(c['value']['value']) for c in constants}
+            scope[column] = scope[column] & values if column in scope else values
+    return scope
+
+
+def _partition_version(manifest: dict, scope: dict) -> str:
+    """
+    Digest of the partitions of a stored version a query can read, given the
+    values it pins partition columns to; other partitions can change without
+    changing it.
+    """
+    from urllib.parse import unquote
+
+    def in_scope(partition: str) -> bool:
+        if partition == '.':
+            return True
+        for part in partition.split(os.sep):
+            column, _, value = part.partition('=')
+            if column in scope and unquote(value) not in scope[column]:
+                return False
+        return True
+
+    digest = hashlib.sha256()
+    for partition, partition_digest in sorted(manifest['partitions'].items()):
+        if in_scope(partition):
+            digest.update(f"{partition}={partition_digest};".encode('utf-8'))
+    return digest.hexdigest()
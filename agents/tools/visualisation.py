@@ -1,51 +1,170 @@
+from __future__ import annotations
+
 from google.adk.tools import ToolContext
 import google.genai.types as types
+from dataclasses import dataclass
 from io import BytesIO
 import base64
+import hashlib
+from typing import TYPE_CHECKING
+
+from .instrumentation import span
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+MIME_TYPES = {
+    'png': 'image/png',
+    'webp': 'image/webp',
+    'svg': 'image/svg+xml',
+}
+
+
+@dataclass(frozen=True)
+class RenderOptions:
+    """
+    How plots are encoded and returned.
+    Args:
+        format (str): Image format, one of 'png', 'webp' or 'svg'.
+        dpi (int): Resolution the figure is rendered at, before the budgets below apply.
+        max_pixels (int): Upper bound on width x height of raster images; the DPI is
+            lowered to stay under it.
+        max_bytes (int): Upper bound on the encoded size of raster images; the figure
+            is re-encoded at a lower DPI until it fits (or `min_dpi` is reached).
+        min_dpi (int): The DPI is never lowered below this.
+        include_data_url (bool): Also return the image as a base64 data URL. Off by
+            default, as the tool response goes into the model context; the saved
+            artifact is enough to display the plot.
+    """
+    format: str = 'png'
+    dpi: int = 400
+    max_pixels: int = 16_000_000
+    max_bytes: int = 2 * 1024 * 1024
+    min_dpi: int = 72
+    include_data_url: bool = False
+
 
-async def _save_plot(name: str, sns_plot, tool_context: ToolContext) -> dict:
+def _render_plot(data: pd.DataFrame, plot_type: str, title: str, height: float, aspect: float, options: RenderOptions = RenderOptions(), **kwargs) -> bytes:
     """
-    Asynchronously saves a plot object as a PNG image artifact.
+    Render a seaborn figure-level plot to image bytes within the size budgets of `options`.
+
+    This is CPU-bound and is meant to run in a worker process, so it only takes
+    and returns picklable values and closes the figure once it is encoded.
+    Args:
+        data (pd.DataFrame): The data to plot.
+        plot_type (str): One of 'relation', 'categorical' or 'distribution'.
+        title (str): The title of the figure.
+        height (float): Height of each facet, in inches.
+        aspect (float): Aspect ratio of each facet.
+        options (RenderOptions): Output format, resolution and size budgets.
+        **kwargs: Passed on to the seaborn plotting function (x, y, hue, col, row, kind).
+    Returns:
+        bytes: The encoded image.
+    """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.set_style('whitegrid')
+
+    SNS_PLOTS = {
+        'relation': sns.relplot,
+        'categorical': sns.catplot,
+        'distribution': sns.displot
+    }
+
+    with span('plot.draw', plot_type=plot_type, kind=kwargs.get('kind'), rows=len(data)):
+        sns_plot = SNS_PLOTS[plot_type](data=data, height=height, aspect=aspect, **kwargs)
+        sns_plot.fig.suptitle(title, fontsize=13, y=1.03)  # adjust `y` as needed
+
+    try:
+        with span('plot.encode', format=options.format) as s:
+            if options.format == 'svg':
+                img = BytesIO()
+                # No creation date and fixed element ids, so identical plots
+                # produce identical bytes.
+                with plt.rc_context({'svg.hashsalt': 'ai-analyst'}):
+                    sns_plot.savefig(img, format='svg', metadata={'Date': None})
+                s.set(image_bytes=len(img.getvalue()))
+                return img.getvalue()
+
+            # Size after tight bbox cropping isn't known up front, so measure the
+            # figure and lower the DPI to fit the pixel budget first.
+            width, height = sns_plot.fig.get_size_inches()
+            dpi = min(options.dpi, (options.max_pixels / (width * height)) ** 0.5)
+
+            while True:
+                img = BytesIO()
+                sns_plot.savefig(img, format=options.format, dpi=max(dpi, options.min_dpi))
+                size = len(img.getvalue())
+                s.add(encodes=1)
+                if size <= options.max_bytes or dpi <= options.min_dpi:
+                    s.set(image_bytes=size, dpi=max(dpi, options.min_dpi))
+                    return img.getvalue()
+                # Encoded size grows roughly with the pixel count, i.e. DPI squared.
+                dpi = dpi * (options.max_bytes / size) ** 0.5 * 0.9
+    finally:
+        plt.close(sns_plot.fig)
+
+
+async def _save_plot(name: str, image: bytes, tool_context: ToolContext, options: RenderOptions = RenderOptions()) -> dict:
+    """
+    Asynchronously saves a rendered plot as an image artifact.
+
+    Plots are deduplicated by a hash of their content: if the same image was
+    already saved in this session, the existing artifact is returned instead
+    of saving it again.
     Args:
         name (str): The name to use for the saved plot file.
-        plot: The plot object to be saved (should have a `savefig` method).
+        image (bytes): The encoded image, as returned by `_render_plot`.
         tool_context (ToolContext): The context object providing the `save_artifact` method.
+        options (RenderOptions): The options the image was rendered with.
     Returns:
         dict: A dictionary containing the status of the operation. On success, includes the artifact version.
               On failure, includes the error message.
     """
-    
-    try:
-        img = BytesIO()
-         
-        sns_plot.savefig(img, format='png', dpi=400)
-        img.seek(0)
-
-        image_artifact = types.Part(
-            inline_data=types.Blob(
-                mime_type="image/png",
-                data=img.getvalue()
-            )
-        )
-
-        base64_str = base64.b64encode(img.getvalue()).decode('utf-8')
-        data_url = f"data:image/png;base64,{base64_str}"
-        filename=f"{name.replace(' ', '_')}.png"
-
-        artifact_version = await tool_context.save_artifact(
-            filename=filename,
-            artifact=image_artifact,
-        )
-
-        return {
-            'status': 'success',
-            'version': artifact_version,
-            'filename': filename,
-            'data_url': data_url
-        }
-
-    except Exception as e:
-        return {
-            'status': 'failure',
-            'error': str(e)
-        }
+
+    with span('plot.save', image_bytes=len(image)) as s:
+        try:
+            mime_type = MIME_TYPES[options.format]
+            digest = hashlib.sha256(image).hexdigest()
+            state_key = f"plot:{digest[:16]}"
+
+            saved = tool_context.state.get(state_key)
+            s.set(deduplicated=saved is not None)
+            if saved is None:
+                image_artifact = types.Part(
+                    inline_data=types.Blob(
+                        mime_type=mime_type,
+                        data=image
+                    )
+                )
+
+                filename=f"{name.replace(' ', '_')}.{options.format}"
+
+                artifact_version = await tool_context.save_artifact(
+                    filename=filename,
+                    artifact=image_artifact,
+                )
+                saved = {'filename': filename, 'version': artifact_version}
+                tool_context.state[state_key] = saved
+
+            result = {
+                'status': 'success',
+                'version': saved['version'],
+                'filename': saved['filename'],
+                'bytes': len(image),
+            }
+
+            if options.include_data_url:
+                base64_str = base64.b64encode(image).decode('utf-8')
+                result['data_url'] = f"data:{mime_type};base64,{base64_str}"
+
+            return result
+
+        except Exception as e:
+            s.set(error=type(e).__name__)
+            return {
+                'status': 'failure',
+                'error': str(e)
+            }
@@ -0,0 +1,342 @@
+"""
+End-to-end benchmarks of the DataToolset tools, driven directly without the LLM.
+
+Every query shape is run against synthetic `volume_forecasts` datasets of a
+few sizes (see `agents/database/synthetic.py`), each case in a fresh process so
+its peak memory is its own. Results are written as JSON for comparing commits:
+
+    python -m benchmarks.toolset --sizes small medium --output before.json
+    python -m benchmarks.toolset --sizes small medium --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import functools
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+# Synthetic dataset parameters per size; rows are business units x service
+# lines x periods.
+SIZES = {
+    'small': dict(business_units=2, service_lines=8, freq='monthly', years=2.25),
+    'medium': dict(business_units=20, service_lines=64, freq='monthly', years=10),
+    'large': dict(business_units=20, service_lines=64, freq='daily', years=5),
+}
+
+DATA_DIR = os.environ.get('AI_ANALYST_BENCHMARK_DATA') or os.path.join(tempfile.gettempdir(), 'ai-analyst-benchmarks')
+
+START = '2023-01-01'
+
+
+class LocalToolContext:
+    """
+    Stand-in for ADK's `ToolContext`, with the session state and artifact
+    store the tools use.
+    """
+
+    def __init__(self):
+        self.state = {}
+        self.artifacts = {}
+
+    async def save_artifact(self, filename: str, artifact) -> int:
+        versions = self.artifacts.setdefault(filename, [])
+        versions.append(artifact)
+        return len(versions) - 1
+
+
+def _freq(size: str) -> str:
+    return 'D' if SIZES[size]['freq'] == 'daily' else 'MS'
+
+
+# Query shapes. Each takes the toolset, a context and the size, and returns
+# the number of rows the case produced.
+
+async def _point_lookup(toolset, context, size):
+    result = await toolset.query_tool(
+        f"SELECT * FROM volume_forecasts WHERE business_unit = 'Retail' AND service_line = 'service_line_3' "
+        f"AND date = DATE '{START}'",
+        context,
+    )
+    return result['num_rows']
+
+
+async def _group_by(toolset, context, size):
+    # avg isn't answered from the rollups, so this scans the dataset.
+    result = await toolset.query_tool(
+        "SELECT business_unit, service_line, year, avg(volume) AS volume, avg(forecast) AS forecast "
+        "FROM volume_forecasts GROUP BY ALL",
+        context,
+    )
+    return result['num_rows']
+
+
+async def _group_by_rollup(toolset, context, size):
+    result = await toolset.query_tool(
+        "SELECT business_unit, stream, year, sum(volume) AS volume, sum(forecast) AS forecast "
+        "FROM volume_forecasts GROUP BY ALL",
+        context,
+    )
+    return result['num_rows']
+
+
+async def _facet_plot(toolset, context, size):
+    result = await toolset.plot_tool(
+        "SELECT date, business_unit, stream, sum(volume) AS volume FROM volume_forecasts GROUP BY ALL",
+        'Volume by stream', 'date', 'volume', 'stream', 'business_unit', None, 'line', 'relation', context,
+    )
+    if result.get('status') != 'success':
+        raise RuntimeError(result)
+    return result['bytes']
+
+
+# Forecasts with a cold model cache nudge the series by a different, tiny
+# amount on every call, which changes its fingerprint, so no worker process
+# has a model for it. Warm ones forecast the same series every time.
+_nudges = itertools.count(1)
+
+
+def _nudge(cold: bool) -> float:
+    return next(_nudges) * 1e-9 if cold else 0.0
+
+
+async def _forecast(toolset, context, size, method='ets', cold=False):
+    result = await toolset.forecast_tool(
+        f"SELECT date, sum(forecast) + {_nudge(cold)} AS forecast FROM volume_forecasts GROUP BY ALL ORDER BY date",
+        'forecast', 'date', 12, _freq(size), method, context,
+    )
+    if 'date' not in result:
+        raise RuntimeError(result)
+    return len(result['date'])
+
+
+async def _multi_series_forecast(toolset, context, size):
+    result = await toolset.forecast_batch_tool(
+        "SELECT business_unit, sub_stream, date, sum(forecast) AS forecast FROM volume_forecasts GROUP BY ALL",
+        ['business_unit', 'sub_stream'], 'forecast', 'date', 12, _freq(size), 'ets', context,
+    )
+    if result['errors']:
+        raise RuntimeError(result['errors'])
+    return len(result['date'])
+
+
+async def _simulation_forecast(toolset, context, size, method='ets', cold=False):
+    import pandas as pd
+    from agents.tools.simulation import _forecast
+
+    # The series is only fetched once; just the forecast is timed after that.
+    if size not in _series:
+        frame = await toolset._run_query(
+            toolset._resolve,
+            "SELECT date, sum(volume) AS volume FROM volume_forecasts WHERE volume IS NOT NULL GROUP BY ALL ORDER BY date",
+            context,
+        )
+        _series[size] = frame.assign(date=pd.to_datetime(frame['date'])).set_index('date')['volume']
+    return len(_forecast(_series[size] + _nudge(cold), 12, _freq(size), method))
+
+
+_series = {}
+
+
+CASES = {
+    'point_lookup': _point_lookup,
+    'group_by': _group_by,
+    'group_by_rollup': _group_by_rollup,
+    'facet_plot': _facet_plot,
+    'forecast': _forecast,
+    'forecast_prophet_cold': functools.partial(_forecast, method='prophet', cold=True),
+    'forecast_prophet_warm': functools.partial(_forecast, method='prophet'),
+    'forecast_auto_cold': functools.partial(_forecast, method='auto', cold=True),
+    'forecast_auto_warm': functools.partial(_forecast, method='auto'),
+    'multi_series_forecast': _multi_series_forecast,
+    'simulation_forecast': _simulation_forecast,
+    'simulation_prophet_cold': functools.partial(_simulation_forecast, method='prophet', cold=True),
+    'simulation_prophet_warm': functools.partial(_simulation_forecast, method='prophet'),
+}
+
+
+def _dataset(size: str) -> str:
+    """
+    Path of the synthetic dataset of a size, generating it on first use.
+    """
+    from agents.database.synthetic import dataset
+
+    root = os.path.join(DATA_DIR, size)
+    path = os.path.join(root, 'volume_forecasts')
+    if not os.path.isfile(os.path.join(path, 'data.csv')):
+        dataset(path, 'volume_forecasts', start=START, **SIZES[size])
+    return path
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    rank = q / 100 * (len(ordered) - 1)
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _max_rss(who: int) -> int:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    rss = resource.getrusage(who).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+async def _measure(size: str, case: str, iterations: int, cached: bool) -> dict:
+    from agents.tools import DataToolset
+    from agents.tools import executor
+
+    toolset = DataToolset(_dataset(size))
+    context = LocalToolContext()
+    run = CASES[case]
+
+    # The first call loads the dataset into the catalog and starts the worker
+    # processes; it is reported on its own.
+    start = time.perf_counter()
+    await run(toolset, context, size)
+    first = time.perf_counter() - start
+
+    latencies, produced = [], 0
+    for _ in range(iterations):
+        if not cached:
+            toolset.cache.clear()
+            toolset.results.clear()
+            context = LocalToolContext()
+        start = time.perf_counter()
+        produced += await run(toolset, context, size)
+        latencies.append(time.perf_counter() - start)
+
+    with toolset.engine.cursor() as con:
+        rows = con.execute("SELECT count(*) FROM volume_forecasts").fetchone()[0]
+
+    # Worker processes only count towards the children's peak once they exit.
+    if executor._process_pool is not None:
+        executor._process_pool.shutdown(wait=True)
+
+    total = sum(latencies)
+    return {
+        'size': size,
+        'case': case,
+        'dataset_rows': rows,
+        'iterations': iterations,
+        'cached': cached,
+        'first_call_s': first,
+        'latency_s': {
+            'p50': _percentile(latencies, 50),
+            'p90': _percentile(latencies, 90),
+            'p99': _percentile(latencies, 99),
+            'mean': total / len(latencies),
+            'min': min(latencies),
+            'max': max(latencies),
+        },
+        'calls_per_s': len(latencies) / total,
+        'dataset_rows_per_s': rows * len(latencies) / total,
+        'output_per_call': produced / len(latencies),
+        'peak_rss_bytes': _max_rss(resource.RUSAGE_SELF),
+        'peak_rss_workers_bytes': _max_rss(resource.RUSAGE_CHILDREN),
+    }
+
+
+def _environment() -> dict:
+    import importlib.metadata
+
+    def version(package):
+        try:
+            return importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            return None
+
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'packages': {p: version(p) for p in ('duckdb', 'pyarrow', 'pandas', 'numpy', 'seaborn', 'prophet')},
+    }
+
+
+def _compare(results: list[dict], baseline: dict):
+    """
+    Print the change in median latency and peak memory of every case against
+    an earlier run.
+    """
+    before = {(r['size'], r['case']): r for r in baseline['results']}
+    print(f"\nagainst {(baseline['environment'].get('commit') or 'unknown')[:12]}:")
+    for r in results:
+        b = before.get((r['size'], r['case']))
+        if b is None:
+            continue
+        p50 = r['latency_s']['p50'] / b['latency_s']['p50'] - 1
+        rss = r['peak_rss_bytes'] / b['peak_rss_bytes'] - 1
+        print(f"  {r['size']:<8} {r['case']:<24} p50 {p50:+7.1%}   peak rss {rss:+7.1%}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['small', 'medium'])
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--cached', action='store_true', help='keep result caches between iterations')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON file of an earlier run to compare against')
+    # Runs a single case and prints its result; used for the per-case processes.
+    parser.add_argument('--worker', nargs=2, metavar=('SIZE', 'CASE'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        size, case = args.worker
+        # Fitted models are shared between the forecast worker processes
+        # through a cache directory of the case's own, so a warm model cache
+        # doesn't depend on which process a forecast lands on.
+        with tempfile.TemporaryDirectory(prefix='ai-analyst-models-') as models:
+            os.environ.setdefault('AI_ANALYST_MODEL_CACHE_DIR', models)
+            print(json.dumps(asyncio.run(_measure(size, case, args.iterations, args.cached))))
+        return 0
+
+    results = []
+    for size in args.sizes:
+        # Generated up front, so no case pays for it.
+        _dataset(size)
+        for case in args.cases:
+            command = [sys.executable, '-m', 'benchmarks.toolset', '--worker', size, case, '--iterations', str(args.iterations)]
+            if args.cached:
+                command.append('--cached')
+            done = subprocess.run(command, capture_output=True, text=True)
+            if done.returncode != 0:
+                print(f"{size} {case} failed:\n{done.stderr}", file=sys.stderr)
+                continue
+            result = json.loads(done.stdout.strip().splitlines()[-1])
+            results.append(result)
+            print(
+                f"{size:<8} {case:<24} p50 {result['latency_s']['p50'] * 1000:9.1f}ms"
+                f"  p99 {result['latency_s']['p99'] * 1000:9.1f}ms"
+                f"  {result['calls_per_s']:8.1f} calls/s"
+                f"  peak rss {result['peak_rss_bytes'] / 2 ** 20:7.0f} MiB"
+            )
+
+    report = {'environment': _environment(), 'sizes': {s: SIZES[s] for s in args.sizes}, 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            _compare(results, json.load(f))
+    return 0 if len(results) == len(args.sizes) * len(args.cases) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
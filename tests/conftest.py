@@ -0,0 +1,83 @@
+import asyncio
+import os
+import shutil
+
+import pytest
+
+# Forecasts run inline rather than in worker processes, which the tests
+# would otherwise have to start for every module.
+os.environ.setdefault('AI_ANALYST_PROCESS_WORKERS', '0')
+
+DATABASE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'agents', 'database')
+
+
+class ToolContext:
+    """
+    Stand-in for ADK's `ToolContext`, with the session state and artifact
+    store the tools use.
+    """
+
+    def __init__(self):
+        self.state = {}
+        self.artifacts = {}
+
+    async def save_artifact(self, filename: str, artifact) -> int:
+        versions = self.artifacts.setdefault(filename, [])
+        versions.append(artifact)
+        return len(versions) - 1
+
+
+@pytest.fixture
+def database(tmp_path):
+    """
+    A copy of the shipped datasets, without their stored Parquet copies, that
+    tests can append to.
+    """
+    for name in ('volume_forecasts', 'business_metrics'):
+        shutil.copytree(
+            os.path.join(DATABASE, name), tmp_path / name,
+            ignore=shutil.ignore_patterns('parquet', '__pycache__'),
+        )
+    return tmp_path
+
+
+@pytest.fixture(params=['parquet', 'arrow'])
+def storage_format(request, monkeypatch):
+    """
+    Run a test against both storage formats (see `storage.STORAGE_FORMAT`).
+    """
+    from agents.tools import catalog
+
+    monkeypatch.setattr(catalog, 'STORAGE_FORMAT', request.param)
+    return request.param
+
+
+@pytest.fixture
+def toolset(database):
+    from agents.tools import DataToolset
+
+    return DataToolset(str(database / 'volume_forecasts'))
+
+
+@pytest.fixture
+def context():
+    return ToolContext()
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def append(database, date: str, business_unit: str, volume: float | None = None):
+    """
+    Append a copy of the first `volume_forecasts` row with another date,
+    business unit and optionally volume, as a new data drop would.
+    """
+    path = database / 'volume_forecasts' / 'data.csv'
+    row = path.read_text().splitlines()[1].replace('2023-01-01', date, 1).replace('Commercial', business_unit)
+    if volume is not None:
+        fields = row.split(',')
+        fields[2] = str(volume)
+        row = ','.join(fields)
+    with open(path, 'a') as f:
+        f.write(row + '\n')
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import run
+
+from agents.tools.backtesting import _grouping_ids, _groupings, _rolling_origin, _series_query
+
+HIERARCHY = ['stream', 'sub_stream', 'service_line']
+SEGMENTS = ['business_unit']
+
+
+def test_groupings_bring_the_levels_above_along():
+    groupings = _groupings(['total', 'sub_stream', 'business_unit,stream', 'stream,business_unit'], HIERARCHY, SEGMENTS)
+    assert groupings == [
+        ('total', []),
+        ('stream,sub_stream', ['stream', 'sub_stream']),
+        ('business_unit,stream', ['business_unit', 'stream']),
+    ]
+    with pytest.raises(ValueError):
+        _groupings(['region'], HIERARCHY, SEGMENTS)
+
+
+def test_grouping_ids_name_the_series_of_each_grouping(toolset):
+    groupings = _groupings(['total', 'business_unit', 'sub_stream', 'business_unit,stream'], HIERARCHY, SEGMENTS)
+    columns = ['business_unit', 'stream', 'sub_stream']
+    names = _grouping_ids(groupings, columns)
+    assert sorted(names.values()) == sorted(name for name, _ in groupings)
+
+    with toolset.engine.cursor() as con:
+        series = con.execute(
+            _series_query('volume_forecasts', groupings, columns, 'date', 'volume', 'forecast', '')
+        ).df()
+    dates = series['date'].nunique()
+    for grouping_id, rows in series.groupby('grouping_id'):
+        cols = dict(groupings)[names[grouping_id]]
+        # Exactly the grouping's own columns are set on its rows.
+        assert all(rows[c].notna().all() == (c in cols) for c in columns)
+        assert len(rows) == dates * (rows[cols].drop_duplicates().shape[0] if cols else 1)
+
+
+def test_rolling_origin_matches_a_hand_computed_fold():
+    index = pd.date_range('2000-01-01', periods=10, freq='YS')
+    actual = pd.Series(np.arange(1.0, 11.0), index=index)
+    short = actual.iloc[:7]
+
+    [result, skipped] = _rolling_origin([actual, short], [actual + 1, short + 1], 2, 2, 'YS', 'seasonal_naive')
+
+    # Origins at 6 and 8: refits forecast the last value seen, 6 and 8, for
+    # the actuals 7, 8 and 9, 10; the plan is always one over.
+    tests = np.array([7.0, 8.0, 9.0, 10.0])
+    errors = np.array([6.0, 6.0, 8.0, 8.0]) - tests
+    assert result['windows'] == 2
+    assert result['refit'] == pytest.approx({
+        'mape': np.mean(np.abs(errors) / tests),
+        'wape': np.abs(errors).sum() / tests.sum(),
+        'bias': errors.sum() / tests.sum(),
+    })
+    assert result['planned'] == pytest.approx({
+        'mape': np.mean(1 / tests),
+        'wape': 4 / tests.sum(),
+        'bias': 4 / tests.sum(),
+    })
+    # Too short for an origin with enough history before it.
+    assert skipped == {'windows': 0}
+
+
+def test_backtest_tool_scores_the_total(toolset, database, context):
+    result = run(toolset.backtest_tool(['total', 'business_unit'], '', 'seasonal_naive', 2, 3, 'MS', context))
+    [total, business_units] = result['groupings']
+    assert result['backtest'] == {'method': 'seasonal_naive', 'cutoffs': 2, 'horizon': 3}
+    assert total['grouping'] == 'total' and total['num_series'] == 1
+    assert business_units['num_series'] == 2
+
+    data = pd.read_csv(database / 'volume_forecasts' / 'data.csv', parse_dates=['date']).dropna(subset=['volume', 'forecast'])
+    series = data.groupby('date')[['volume', 'forecast']].sum().sort_index()
+    error = series['forecast'] - series['volume']
+
+    [entry] = total['series']
+    assert entry['n'] == len(series)
+    assert entry['wape'] == pytest.approx(error.abs().sum() / series['volume'].abs().sum())
+    assert entry['bias'] == pytest.approx(error.sum() / series['volume'].sum())
+    assert entry['mape'] == pytest.approx((error.abs() / series['volume'].abs()).mean())
+
+    # The plan is scored over the last two windows of three months.
+    window = series.iloc[-6:]
+    backtest = entry['backtest']
+    assert backtest['windows'] == 2
+    assert backtest['planned']['wape'] == pytest.approx(
+        (window['forecast'] - window['volume']).abs().sum() / window['volume'].abs().sum()
+    )
@@ -0,0 +1,19 @@
+from conftest import run
+
+from agents.tools.cache import ResultCache, _normalize_sql
+
+
+def test_keywords_and_whitespace_share_a_key():
+    assert _normalize_sql("SELECT  sum(volume) AS v\nFROM t WHERE x IN (1);") == _normalize_sql(
+        "select sum(volume) as v from t where x in (1)"
+    )
+    assert ResultCache.key("SELECT NOW()", 'v') is None
+
+
+def test_aliases_keep_their_case(toolset, context):
+    assert _normalize_sql("SELECT 1 AS Total") != _normalize_sql("SELECT 1 AS total")
+
+    upper = run(toolset.query_tool("SELECT sum(volume) AS Total FROM volume_forecasts", context))
+    lower = run(toolset.query_tool("SELECT sum(volume) AS total FROM volume_forecasts", context))
+    assert list(upper['data']) == ['Total'] and list(lower['data']) == ['total']
+    assert upper['handle'] != lower['handle']
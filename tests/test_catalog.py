@@ -0,0 +1,61 @@
+import os
+import time
+
+from conftest import append
+
+from agents.tools.catalog import Catalog
+
+COUNT = "SELECT count(*) FROM volume_forecasts"
+
+
+def test_cursors_keep_their_version_across_refreshes(database, storage_format):
+    catalog = Catalog(str(database))
+    _, before = catalog.checkout(['volume_forecasts'])
+
+    append(database, '2025-04-01', 'Wholesale')
+    _, after = catalog.checkout(['volume_forecasts'])
+    append(database, '2025-05-01', 'Wholesale')
+    catalog.checkout(['volume_forecasts'])
+
+    # Both cursors still query fine; memory-mapped versions are pinned to
+    # the cursor they were handed out with.
+    counts = [before.execute(COUNT).fetchone()[0], after.execute(COUNT).fetchone()[0]]
+    if storage_format == 'arrow':
+        assert counts == [432, 433]
+
+
+def test_touched_sources_keep_their_version(database, storage_format):
+    catalog = Catalog(str(database))
+    catalog.checkout(['volume_forecasts'])
+    before = catalog.manifest('volume_forecasts')
+    directory = database / 'volume_forecasts' / 'parquet' / before['directory']
+    inode = os.stat(directory).st_ino
+
+    path = database / 'volume_forecasts' / 'data.csv'
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 10**9))
+    _, con = catalog.checkout(['volume_forecasts'])
+
+    after = catalog.manifest('volume_forecasts')
+    assert (after['version'], after['directory']) == (before['version'], before['directory'])
+    assert after['files']['data.csv']['mtime_ns'] != before['files']['data.csv']['mtime_ns']
+    # Not rewritten in place under the other processes reading it.
+    assert os.stat(directory).st_ino == inode
+    assert con.execute(COUNT).fetchone()[0] == 432
+
+
+def test_returning_to_an_earlier_version_writes_a_new_directory(database, storage_format):
+    catalog = Catalog(str(database))
+    catalog.checkout(['volume_forecasts'])
+    first = catalog.manifest('volume_forecasts')
+
+    path = database / 'volume_forecasts' / 'data.csv'
+    original = path.read_text()
+    append(database, '2025-04-01', 'Wholesale')
+    _, previous = catalog.checkout(['volume_forecasts'])
+    path.write_text(original)
+    _, con = catalog.checkout(['volume_forecasts'])
+
+    manifest = catalog.manifest('volume_forecasts')
+    assert manifest['version'] == first['version'] and manifest['directory'] != first['directory']
+    assert con.execute(COUNT).fetchone()[0] == 432
+    assert previous.execute(COUNT).fetchone()[0] in (432, 433)
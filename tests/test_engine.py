@@ -0,0 +1,85 @@
+import pytest
+
+from agents.tools.engine import _table_names
+from agents.tools.governance import QueryNotAllowed
+
+from conftest import append, run
+
+
+@pytest.mark.parametrize('sql_query, names', [
+    ("SELECT * FROM business_metrics b JOIN volume_forecasts v USING (date)", {'business_metrics', 'volume_forecasts'}),
+    ("SELECT * FROM business_metrics NATURAL JOIN volume_forecasts", {'business_metrics', 'volume_forecasts'}),
+    ("WITH x AS (SELECT * FROM a) SELECT * FROM x WHERE 1 IN (SELECT 1 FROM b)", {'a', 'b'}),
+    ("SELECT * FROM main.a, temp.main.b", {'a', 'temp.main.b'}),
+])
+def test_table_names(sql_query, names):
+    assert _table_names(sql_query) == names
+
+
+def test_table_names_of_invalid_sql():
+    with pytest.raises(QueryNotAllowed):
+        _table_names("SELEC 1")
+
+
+def test_using_join_across_datasets(toolset, context):
+    result = run(toolset.query_tool(
+        "SELECT count(*) AS n FROM business_metrics b JOIN volume_forecasts v USING (date)", context
+    ))
+    on = run(toolset.query_tool(
+        "SELECT count(*) AS n FROM business_metrics b JOIN volume_forecasts v ON b.date = v.date", context
+    ))
+    assert result['data']['n'] == on['data']['n'] and on['data']['n'][0] > 0
+
+
+def test_invalid_sql_is_a_failure(toolset, context):
+    result = run(toolset.query_tool("SELECT * FROM volume_forecasts WHERE", context))
+    assert result['status'] == 'failure' and result['reason'] == 'not_allowed'
+
+
+@pytest.mark.parametrize('sql_query', [
+    "SELECT * FROM read_csv_auto('/etc/passwd')",
+    "SELECT * FROM '/etc/passwd'",
+    "SELECT * FROM volume_forecasts WHERE date IN (SELECT date FROM read_text('/etc/hostname'))",
+    "SELECT * FROM duckdb_tables()",
+])
+def test_files_and_table_functions_are_not_allowed(toolset, context, sql_query):
+    result = run(toolset.query_tool(sql_query, context))
+    assert result['status'] == 'failure' and result['reason'] == 'not_allowed'
+
+
+def test_scope_covers_storage_paths(database, context):
+    from agents.tools import DataToolset
+
+    toolset = DataToolset(str(database / 'volume_forecasts'), scope=['volume_forecasts'])
+    path = database / 'business_metrics' / 'parquet' / '**' / '*.parquet'
+    result = run(toolset.query_tool(f"SELECT * FROM read_parquet('{path}')", context))
+    assert result['status'] == 'failure' and result['reason'] == 'not_allowed'
+    result = run(toolset.query_tool("SELECT * FROM business_metrics", context))
+    assert result['status'] == 'failure' and result['reason'] == 'not_allowed'
+
+
+def test_generators_are_allowed(toolset, context):
+    result = run(toolset.query_tool("SELECT count(*) AS n FROM range(3)", context))
+    assert result['data']['n'] == [3]
+
+
+@pytest.mark.parametrize('sql_query', [
+    "SELECT count(*) AS n FROM volume_forecasts "
+    "WHERE business_unit = 'Commercial' AND volume > (SELECT avg(volume) FROM volume_forecasts)",
+    "SELECT sum(volume) / (SELECT sum(volume) FROM volume_forecasts) AS n FROM volume_forecasts "
+    "WHERE business_unit = 'Commercial'",
+])
+def test_subqueries_see_rows_appended_to_other_partitions(toolset, database, context, sql_query):
+    before = run(toolset.query_tool(sql_query, context))['data']['n']
+    append(database, '2025-04-01', 'Retail', volume=1e9)
+    after = run(toolset.query_tool(sql_query, context))['data']['n']
+    assert after != before
+
+
+def test_filtered_queries_keep_their_version_when_other_partitions_change(toolset, database):
+    sql_query = "SELECT sum(volume) FROM volume_forecasts WHERE business_unit = 'Commercial'"
+    with toolset.engine.cursor() as con:
+        before = toolset.engine.version_of(con, sql_query)
+    append(database, '2025-04-01', 'Retail')
+    with toolset.engine.cursor() as con:
+        assert toolset.engine.version_of(con, sql_query) == before
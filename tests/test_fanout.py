@@ -0,0 +1,8 @@
+from agents.sub_agents.fanout import build_fanout_agent
+
+
+def test_parallel_agents_stay_on_their_branch(toolset):
+    fanout, merge = build_fanout_agent({'volume_forecasts': toolset}).sub_agents
+    [agent] = fanout.sub_agents
+    assert agent.name == 'volume_forecasts_parallel_agent'
+    assert agent.disallow_transfer_to_parent and agent.disallow_transfer_to_peers
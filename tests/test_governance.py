@@ -0,0 +1,46 @@
+import duckdb
+import pytest
+
+from agents.tools import DataToolset
+from agents.tools.engine import _fetch_arrow, _is_truncated
+from agents.tools.governance import QueryPolicy
+
+from conftest import run
+
+
+def test_cross_joins_are_too_costly(database, context, storage_format):
+    toolset = DataToolset(str(database / 'volume_forecasts'), query_policy=QueryPolicy(max_cost=1e6))
+    result = run(toolset.query_tool(
+        "SELECT count(*) AS n FROM volume_forecasts a, volume_forecasts b, volume_forecasts c", context
+    ))
+    assert result['status'] == 'failure' and result['reason'] == 'too_costly'
+
+    result = run(toolset.query_tool("SELECT count(*) AS n FROM volume_forecasts", context))
+    assert result['data']['n'] == [432]
+
+
+# Results are held in memory up to `max_result_bytes`, and summarised and
+# paged in DuckDB past it.
+@pytest.mark.parametrize('max_result_bytes', [64 * 1024 * 1024, 1])
+def test_results_over_the_row_limit_are_truncated(database, context, max_result_bytes):
+    toolset = DataToolset(
+        str(database / 'volume_forecasts'), query_policy=QueryPolicy(max_rows=150),
+        page_rows=100, max_result_bytes=max_result_bytes,
+    )
+    result = run(toolset.query_tool("SELECT * FROM volume_forecasts", context))
+    assert result['truncated'] is True
+    assert result['num_rows'] == 150
+    assert result['summary']['date']['count'] == 150
+
+    page = run(toolset.page_tool(result['next_cursor'], context))
+    assert len(page['data']['date']) == 50 and page['next_cursor'] is None
+
+    result = run(toolset.query_tool("SELECT * FROM volume_forecasts LIMIT 150", context))
+    assert result['truncated'] is False and result['num_rows'] == 150
+
+
+def test_truncated_results_stop_reading_at_the_limit():
+    # Reading ten billion rows to the end would not finish.
+    table = _fetch_arrow(duckdb.connect(), "SELECT * FROM range(10000000000)", limit_rows=5000)
+    assert table.num_rows == 5000 and _is_truncated(table)
+    assert not _is_truncated(_fetch_arrow(duckdb.connect(), "SELECT * FROM range(10)", limit_rows=10))
@@ -0,0 +1,32 @@
+import pytest
+
+from agents.tools.engine import _unique_names
+
+from conftest import run
+
+SELF_JOIN = (
+    "SELECT * FROM volume_forecasts a JOIN volume_forecasts b "
+    "ON a.date = b.date AND a.business_unit = b.business_unit AND a.service_line = b.service_line"
+)
+
+
+def test_unique_names():
+    assert _unique_names(['a', 'a', 'a', 'A', 'b']) == ['a', 'a_1', 'a_2', 'A_3', 'b']
+    assert _unique_names(['a', 'a', 'a_1']) == ['a', 'a_1', 'a_1_1']
+
+
+@pytest.mark.parametrize('max_result_bytes', [64 * 1024 * 1024, 1])
+def test_duplicate_columns(toolset, context, max_result_bytes):
+    # Results over max_result_bytes are paged by DuckDB instead of from Arrow;
+    # both name the duplicates the same way.
+    toolset.max_result_bytes = max_result_bytes
+    result = run(toolset.query_tool(SELF_JOIN, context))
+    assert result['num_rows'] == 432
+    assert list(result['summary']) == list(result['data'])
+    assert {'date', 'date_1', 'volume', 'volume_1'} <= set(result['summary'])
+    assert result['summary']['date_1']['count'] == 432
+    # Distinct counts are approximate.
+    assert result['summary']['service_line_1']['distinct'] == pytest.approx(8, abs=1)
+
+    page = run(toolset.page_tool(result['next_cursor'], context))
+    assert list(page['data']) == list(result['data'])
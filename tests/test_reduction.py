@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from conftest import run
+
+from agents.tools import DataToolset
+from agents.tools.reduction import _reduce_relation
+
+
+def _data(repeats: int) -> pd.DataFrame:
+    x = np.repeat(np.arange(200), repeats)
+    return pd.DataFrame({'x': x, 'y': np.sin(x / 10) + np.tile(np.arange(repeats), 200), 'g': 'a'})
+
+
+def test_averaged_lines_turn_off_the_confidence_band():
+    data, overrides = _reduce_relation(_data(3), 'x', 'y', 'line', [], 100)
+    assert len(data) <= 100 and data['x'].is_unique
+    assert overrides == {'errorbar': None}
+
+
+def test_lines_with_one_value_per_x_keep_their_overrides():
+    data, overrides = _reduce_relation(_data(1), 'x', 'y', 'line', ['g'], 100)
+    assert len(data) <= 100 and overrides == {}
+    assert _reduce_relation(_data(3), 'x', 'y', 'scatter', [], 100)[1] == {}
+
+
+def test_plot_notes_the_reduction(database, context):
+    toolset = DataToolset(str(database / 'volume_forecasts'), max_plot_points=10)
+    result = run(toolset.plot_tool(
+        "SELECT date, volume FROM volume_forecasts", 'Volume', 'date', 'volume',
+        None, None, None, 'line', 'relation', context,
+    ))
+    assert result['status'] == 'success'
+    assert result['note'] == "Drawn from 10 points summarising 432 rows, without error bars or confidence bands."
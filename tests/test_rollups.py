@@ -0,0 +1,88 @@
+import pytest
+
+from conftest import append
+
+from agents.tools import catalog as catalog_module
+from agents.tools.catalog import Catalog
+from agents.tools.rollups import _rollup_query
+from agents.tools.storage import _quote
+
+ROUTED = [
+    "SELECT sum(volume) AS v FROM volume_forecasts",
+    "SELECT stream, sum(volume) AS v, sum(forecast) AS f FROM volume_forecasts GROUP BY stream ORDER BY stream",
+    "SELECT business_unit, year, sum(forecast) - sum(volume) AS err FROM volume_forecasts WHERE year = 2024 GROUP BY ALL",
+    "SELECT sub_stream, date, sum(volume) AS v FROM volume_forecasts "
+    "WHERE stream = 'stream_A' AND date >= DATE '2024-01-01' GROUP BY ALL HAVING sum(volume) > 100",
+    "SELECT DISTINCT stream FROM volume_forecasts",
+    "SELECT count(DISTINCT service_line) AS n FROM volume_forecasts",
+    "SELECT min(date) AS first, max(date) AS last FROM volume_forecasts WHERE business_unit = 'Retail'",
+    "SELECT month, sum(volume) / sum(forecast) AS ratio FROM volume_forecasts GROUP BY month ORDER BY ratio DESC",
+    "SELECT stream, sum(volume) FILTER (WHERE year = 2023) AS v FROM volume_forecasts GROUP BY stream",
+    "SELECT date_trunc('year', date) AS y, sum(volume) AS v FROM volume_forecasts GROUP BY y ORDER BY y",
+    "SELECT service_line, sum(volume) AS v FROM volume_forecasts GROUP BY service_line ORDER BY v DESC LIMIT 3",
+    "SELECT CASE WHEN stream = 'stream_A' THEN 'A' ELSE 'B' END AS s, sum(forecast) AS f FROM volume_forecasts GROUP BY 1",
+    "SELECT stream, sub_stream, service_line, sum(volume) AS v FROM volume_forecasts GROUP BY ROLLUP (stream, sub_stream, service_line)",
+    "SELECT volume_forecasts.stream, sum(volume) AS v FROM volume_forecasts GROUP BY 1",
+    "SELECT v.stream, sum(v.volume) AS v FROM volume_forecasts v WHERE v.year = 2024 GROUP BY 1",
+]
+
+NOT_ROUTED = [
+    "SELECT avg(volume) AS v FROM volume_forecasts",
+    "SELECT count(*) AS n FROM volume_forecasts",
+    "SELECT stream, sum(volume) OVER (PARTITION BY stream) AS v FROM volume_forecasts",
+    "SELECT stream, sum(volume * 2) AS v FROM volume_forecasts GROUP BY stream",
+    "SELECT * FROM volume_forecasts",
+]
+
+
+def _rows(con, sql_query: str) -> list:
+    return sorted(con.execute(sql_query).fetchall(), key=repr)
+
+
+def _assert_same(rows: list, expected: list):
+    # Sums come out of a different order of additions, so floats only match
+    # approximately.
+    assert len(rows) == len(expected)
+    for row, other in zip(rows, expected):
+        assert [pytest.approx(v) if isinstance(v, float) else v for v in other] == list(row)
+
+
+@pytest.mark.parametrize('sql_query', ROUTED)
+def test_routed_queries_match_the_dataset(toolset, storage_format, sql_query):
+    version, con = toolset.engine.checkout()
+    with con:
+        routed = toolset.engine.route(con, sql_query)
+        assert routed != sql_query
+        _assert_same(_rows(con, routed), _rows(con, sql_query))
+
+
+@pytest.mark.parametrize('sql_query', NOT_ROUTED)
+def test_other_queries_are_not_routed(toolset, sql_query):
+    _, con = toolset.engine.checkout()
+    with con:
+        assert toolset.engine.route(con, sql_query) == sql_query
+
+
+def test_rollups_after_appending_match_a_rebuild(database, storage_format, monkeypatch):
+    updates = []
+    update = catalog_module._update_rollups
+    monkeypatch.setattr(catalog_module, '_update_rollups', lambda *args: updates.append(args) or update(*args))
+
+    catalog = Catalog(str(database))
+    catalog.checkout(['volume_forecasts'])
+    # One row into groups that already exist, one into new ones.
+    append(database, '2023-01-01', 'Commercial')
+    append(database, '2025-04-01', 'Wholesale')
+    _, con = catalog.checkout(['volume_forecasts'])
+
+    # Only Parquet storage updates the rollups in place; Arrow rewrites them.
+    assert len(updates) == (1 if storage_format == 'parquet' else 0)
+    rollups = catalog.rollups(['volume_forecasts'])
+    assert rollups
+    with con:
+        assert con.execute("SELECT count(*) FROM volume_forecasts").fetchone()[0] == 434
+        for rollup in rollups:
+            order = ', '.join(_quote(k) for k in rollup.dimensions)
+            stored = con.execute(f"SELECT * FROM {_quote(rollup.table)} ORDER BY {order}").fetchall()
+            rebuilt = con.execute(f"SELECT * FROM ({_rollup_query(rollup)}) ORDER BY {order}").fetchall()
+            _assert_same(stored, rebuilt)
@@ -0,0 +1,51 @@
+import asyncio
+import threading
+
+from conftest import append, run
+
+from agents.tools import DataToolset
+
+
+def test_instruction_lists_columns_and_values(toolset):
+    instruction = run(toolset.instruction_provider(None))
+    assert "volume_forecasts: 432 rows" in instruction
+    assert "- business_unit VARCHAR: 'Commercial', 'Retail'" in instruction
+    assert "- date DATE: 2023-01-01 to 2025-03-01" in instruction
+    assert "business_metrics(date DATE, metric_name VARCHAR" in instruction
+
+
+def test_instruction_follows_the_data(toolset, database):
+    run(toolset.instruction_provider(None))
+    append(database, '2025-04-01', 'Wholesale')
+
+    instruction = run(toolset.instruction_provider(None))
+    assert "volume_forecasts: 433 rows" in instruction
+    assert "'Commercial', 'Retail', 'Wholesale'" in instruction
+    assert "2023-01-01 to 2025-04-01" in instruction
+
+
+def test_instruction_is_built_off_the_event_loop(toolset, monkeypatch):
+    threads = []
+    build = type(toolset)._build_instruction
+
+    def recording(self):
+        threads.append(threading.current_thread())
+        return build(self)
+
+    monkeypatch.setattr(type(toolset), '_build_instruction', recording)
+
+    async def main():
+        return await toolset.instruction_provider(None), threading.current_thread()
+
+    _, loop_thread = asyncio.run(main())
+    assert threads and threads[0] is not loop_thread
+
+
+def test_datasets_without_a_description(database, context):
+    (database / 'regions').mkdir()
+    (database / 'regions' / 'data.csv').write_text("region,manager\nNorth,Ann\nSouth,Bo\n")
+    toolset = DataToolset(str(database / 'regions'))
+    assert 'regions' in toolset.description
+
+    assert run(toolset.query_tool("SELECT count(*) AS n FROM regions", context))['data']['n'] == [2]
+    assert "regions: 2 rows" in run(toolset.instruction_provider(None))
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import run
+
+from agents.tools.simulation import _choose_method, _forecast
+
+
+@pytest.mark.parametrize('index, freq, first', [
+    (pd.date_range('2020-01-01', periods=24, freq='MS'), 'MS', '2022-01-01'),
+    (pd.date_range('2020-01-31', periods=24, freq='ME'), 'ME', '2022-01-31'),
+    # Month-start data forecast at month ends: December still ends after the
+    # last observation.
+    (pd.date_range('2020-01-01', periods=24, freq='MS'), 'ME', '2021-12-31'),
+    (pd.date_range('2020-01-01', periods=24, freq='D'), 'D', '2020-01-25'),
+])
+def test_future_dates_follow_the_last_date(index, freq, first):
+    y = pd.Series(np.arange(24.0), index=index)
+    forecast = _forecast(y, 6, freq, 'ets')
+    assert len(forecast) == 6
+    assert forecast.index[0] == pd.Timestamp(first)
+    assert forecast.index.is_monotonic_increasing
+
+
+def test_auto_forecasts_constant_series_with_ets():
+    y = pd.Series(5.0, index=pd.date_range('2015-01-01', periods=60, freq='MS'))
+    assert _choose_method(y, 'MS') == 'ets'
+    assert _forecast(y, 3, 'MS', 'auto').tolist() == pytest.approx([5.0] * 3)
+
+
+@pytest.mark.parametrize('tool, args', [
+    ('forecast_tool', ()),
+    ('forecast_batch_tool', (['business_unit'],)),
+])
+def test_forecast_tools_reject_unknown_methods(toolset, context, tool, args):
+    result = run(getattr(toolset, tool)(
+        "SELECT date, business_unit, sum(volume) AS volume FROM volume_forecasts GROUP BY ALL",
+        *args, 'volume', 'date', 3, 'MS', 'arima', context,
+    ))
+    assert result['status'] == 'failure'
+    assert "Unknown forecast method 'arima'" in result['error']